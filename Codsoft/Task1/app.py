@@ -1,60 +1,209 @@
 import streamlit as st
-from datetime import datetime
-import json
+from datetime import date
+import io
+import os
+from collections import OrderedDict
+
+from profiler import ProfileHistory, RerunProfiler, append_log
+from task_core import TaskManager, open_store
+import task_io
+from task_record import PRIORITIES, PRIORITY_RANK, ConflictError, format_due, to_ordinal
 
 # Page configuration
 st.set_page_config(page_title="To-Do List Manager", page_icon="✅", layout="wide")
 
+# Rerun profiling: set TODO_PROFILE=1 or open the app with ?profile=1.
+# TODO_PROFILE_LOG=<path> also appends every rerun's timings there as JSON lines.
+profiler = RerunProfiler(os.environ.get("TODO_PROFILE") == "1" or st.query_params.get("profile") == "1")
+
+# Small LRU cache for the filtered/sorted task views. Keys start with the
+# store version, so any change makes older entries unreachable and they just
+# age out; reruns that change nothing skip filtering and sorting entirely.
+class ViewCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+# The journaled store is opened once per process and shared by every session
+# (each tab and reload is a new session): its journal directory can only have
+# one writer. The store locks itself, and each session's TaskManager picks up
+# the others' changes through tasks.sync() like with SQLite.
+@st.cache_resource
+def open_journal_store(journal_dir):
+    return open_store(journal_dir=journal_dir)
+
 # Initialize session state for tasks
+# Set TODO_DB_PATH to keep tasks in a SQLite file that every session (and app
+# replica) pointing at it shares, or TODO_JOURNAL_DIR to keep an in-memory
+# store, shared by this process's sessions, persisted through an append-only
+# journal.
+# TODO_UNDO_KB=<n> sets the undo history budget.
 if 'tasks' not in st.session_state:
-    st.session_state.tasks = []
+    db_path = os.environ.get("TODO_DB_PATH")
+    journal_dir = os.environ.get("TODO_JOURNAL_DIR")
+    if journal_dir and not db_path:
+        session_store = open_journal_store(journal_dir)
+    else:
+        session_store = open_store(db_path)
+    st.session_state.tasks = TaskManager(
+        session_store, undo_limit=int(os.environ.get("TODO_UNDO_KB", "1024")) * 1024)
+
+if 'view_cache' not in st.session_state:
+    st.session_state.view_cache = ViewCache()
 
-if 'task_id_counter' not in st.session_state:
-    st.session_state.task_id_counter = 1
+tasks = st.session_state.tasks
+store = tasks.store
+stats = tasks.stats
+view_cache = st.session_state.view_cache
+
+tasks.sync()
+
+# Helper functions: turn widget values into TaskManager calls. A change based
+# on an outdated copy of a task is reported instead of applied.
+def report_conflict(error):
+    st.session_state.conflict = f"⚠️ {error}. Showing the latest version."
+    tasks.sync()
 
-# Helper functions
 def add_task(title, description, priority, due_date):
-    task = {
-        'id': st.session_state.task_id_counter,
-        'title': title,
-        'description': description,
-        'priority': priority,
-        'due_date': due_date.strftime('%Y-%m-%d') if due_date else None,
-        'completed': False,
-        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    st.session_state.tasks.append(task)
-    st.session_state.task_id_counter += 1
+    tasks.add(title, description, PRIORITY_RANK[priority], to_ordinal(due_date))
+    return True
+
+def delete_task(task_id, expected_version=None):
+    try:
+        tasks.delete(task_id, expected_version)
+    except ConflictError as e:
+        report_conflict(e)
+        return False
+    return True
+
+def toggle_task(task_id, expected_version=None):
+    try:
+        tasks.toggle(task_id, expected_version)
+    except ConflictError as e:
+        report_conflict(e)
+        return False
+    return True
+
+def update_task(task_id, title, description, priority, due_date, expected_version=None):
+    try:
+        tasks.update(task_id, expected_version,
+                     title=title,
+                     description=description,
+                     priority=PRIORITY_RANK[priority],
+                     due=to_ordinal(due_date))
+    except ConflictError as e:
+        report_conflict(e)
+        return False
     return True
 
-def delete_task(task_id):
-    st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task_id]
+def purge_completed():
+    tasks.purge_completed()
+
+def undo():
+    try:
+        tasks.undo()
+    except ConflictError as e:
+        report_conflict(e)
+
+def redo():
+    try:
+        tasks.redo()
+    except ConflictError as e:
+        report_conflict(e)
+
+BATCH_ACTIONS = ["Complete", "Reopen", "Delete", "Change Priority", "Shift Due Date"]
+
+def apply_batch_action(action, task_ids, priority=None, days=0):
+    if action == "Complete":
+        tasks.update_many({task_id: {'completed': True} for task_id in task_ids})
+    elif action == "Reopen":
+        tasks.update_many({task_id: {'completed': False} for task_id in task_ids})
+    elif action == "Delete":
+        tasks.delete_many(task_ids)
+    elif action == "Change Priority":
+        tasks.update_many({task_id: {'priority': PRIORITY_RANK[priority]} for task_id in task_ids})
+    elif action == "Shift Due Date":
+        tasks.shift_due_dates(task_ids, days)
+
+def import_tasks(file, fmt):
+    errors = []
+    imported = tasks.import_tasks(file, fmt, errors)
+    return len(imported), errors
+
+# Bulk export: write the tasks out piece by piece, encoded straight into a
+# BytesIO, so the export is never built as one big string first. The download
+# button needs the whole file in memory anyway (it only takes str, bytes or an
+# in-memory/opened file), and BytesIO is handed over without another copy.
+def export_tasks(fmt):
+    out = io.BytesIO()
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    task_io.write_tasks(store.iter_tasks(), text, fmt)
+    text.flush()
+    text.detach()
+    out.seek(0)
+    return out
 
-def toggle_task(task_id):
-    for task in st.session_state.tasks:
-        if task['id'] == task_id:
-            task['completed'] = not task['completed']
-            break
+# Edit picker: only the top matches for what was typed are sent to the
+# browser, and each option is the task id itself
+PICKER_SIZE = 20
 
-def update_task(task_id, title, description, priority, due_date):
-    for task in st.session_state.tasks:
-        if task['id'] == task_id:
-            task['title'] = title
-            task['description'] = description
-            task['priority'] = priority
-            task['due_date'] = due_date.strftime('%Y-%m-%d') if due_date else None
-            break
+# Pagination helpers for the "All Tasks" tab
+PAGE_SIZES = [10, 25, 50, 100]
+
+def reset_page():
+    st.session_state.page = 1
+
+def change_page(step):
+    st.session_state.page += step
 
 def get_priority_color(priority):
     colors = {'High': '🔴', 'Medium': '🟡', 'Low': '🟢'}
     return colors.get(priority, '⚪')
 
+# Reminders: the panel lists at most this many tasks per group, and tasks due
+# within DUE_SOON_DAYS are flagged in the task list
+REMINDER_WINDOWS = {"Today": 0, "Next 3 days": 3, "Next 7 days": 7, "Next 30 days": 30}
+REMINDER_LIMIT = 5
+DUE_SOON_DAYS = 1
+
+def describe_due(due):
+    days = due - stats.today
+    if days < 0:
+        return f"{-days} day{'s' if days != -1 else ''} overdue"
+    if days == 0:
+        return "due today"
+    if days == 1:
+        return "due tomorrow"
+    return f"due in {days} days"
+
+def reminder_lines(entries):
+    lines = []
+    for due, task_id in entries:
+        task = store.get(task_id)
+        if task is not None:
+            lines.append(f"{get_priority_color(task.priority_name)} **{task.title}** · {describe_due(due)}")
+    return lines
+
 # Main UI
 st.title("✅ To-Do List Manager")
 st.markdown("---")
 
 # Sidebar for adding new tasks
-with st.sidebar:
+with st.sidebar, profiler.section("sidebar"):
     st.header("➕ Add New Task")
     
     with st.form("add_task_form", clear_on_submit=True):
@@ -64,6 +213,7 @@ with st.sidebar:
         new_due_date = st.date_input("Due Date", value=None)
         
         submit_button = st.form_submit_button("Add Task", use_container_width=True)
+        profiler.count_widgets(5)
         
         if submit_button:
             if new_title.strip():
@@ -75,119 +225,295 @@ with st.sidebar:
     
     st.markdown("---")
     
+    # Bulk import / export
+    st.header("📦 Import / Export")
+    
+    if 'import_result' in st.session_state:
+        imported_count, import_errors = st.session_state.pop('import_result')
+        st.success(f"✅ Imported {imported_count} tasks")
+        if import_errors:
+            st.warning(f"⚠️ Skipped {len(import_errors)} invalid record(s)"
+                       + (" (showing the first few)" if len(import_errors) >= task_io.MAX_ERRORS else ""))
+            st.caption("\n".join(f"Record {number}: {message}" for number, message in import_errors[:10]))
+    
+    uploaded_file = st.file_uploader("Import tasks", type=["ndjson", "jsonl", "json", "csv"])
+    profiler.count_widgets(3 if uploaded_file is None else 4)
+    if uploaded_file is not None and st.button("📥 Import", use_container_width=True):
+        extension = uploaded_file.name.rsplit(".", 1)[-1].lower()
+        import_format = {"csv": "CSV", "json": "JSON"}.get(extension, "NDJSON")
+        import_file = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+        st.session_state.import_result = import_tasks(import_file, import_format)
+        import_file.detach()
+        st.rerun()
+    
+    export_format = st.selectbox("Export format", task_io.FORMATS)
+    st.download_button("📤 Export tasks", data=lambda: export_tasks(export_format),
+                       file_name=f"tasks.{task_io.EXTENSIONS[export_format]}",
+                       mime=task_io.MIME_TYPES[export_format], use_container_width=True,
+                       disabled=not stats.total)
+    
+    st.markdown("---")
+    
     # Statistics
     st.header("📊 Statistics")
-    total_tasks = len(st.session_state.tasks)
-    completed_tasks = len([t for t in st.session_state.tasks if t['completed']])
-    pending_tasks = total_tasks - completed_tasks
+    total_tasks = stats.total
+    completed_tasks = stats.completed
+    pending_tasks = stats.pending
     
     col1, col2 = st.columns(2)
     with col1:
         st.metric("Total", total_tasks)
         st.metric("Completed", completed_tasks)
+        st.metric("Overdue", stats.overdue)
     with col2:
         st.metric("Pending", pending_tasks)
         if total_tasks > 0:
             completion_rate = (completed_tasks / total_tasks) * 100
             st.metric("Progress", f"{completion_rate:.0f}%")
+    
+    st.caption(" | ".join(f"{get_priority_color(p)} {p}: {stats.by_priority[rank]}"
+                          for rank, p in enumerate(PRIORITIES)))
+    
+    st.markdown("---")
+    
+    # Reminders, read straight off the due-date heap
+    st.header("🔔 Reminders")
+    next_up = stats.reminders.next_due()
+    if next_up:
+        next_task = store.get(next_up[1])
+        if next_task is not None:
+            st.info(f"Next up: **{next_task.title}** ({format_due(next_up[0])}, {describe_due(next_up[0])})")
+    
+    if stats.overdue:
+        overdue_lines = reminder_lines(stats.reminders.overdue_tasks(REMINDER_LIMIT))
+        more = stats.overdue - len(overdue_lines)
+        st.error("🚨 Overdue\n\n" + "\n\n".join(overdue_lines) + (f"\n\n…and {more} more" if more > 0 else ""))
+    
+    window = st.selectbox("Due within", list(REMINDER_WINDOWS), key="reminder_window")
+    due_soon = stats.reminders.due_within(REMINDER_WINDOWS[window], REMINDER_LIMIT + 1)
+    if due_soon:
+        due_lines = reminder_lines(due_soon[:REMINDER_LIMIT])
+        if len(due_soon) > REMINDER_LIMIT:
+            due_lines.append("…and more")
+        st.warning("⏰ Coming up\n\n" + "\n\n".join(due_lines))
+    elif not stats.overdue:
+        st.caption("Nothing due in this window.")
+    profiler.count_widgets(1)
 
 # Main content area
+undo_col, redo_col, _ = st.columns([1, 1, 6])
+with undo_col:
+    st.button("↩️ Undo", on_click=undo, disabled=not tasks.history.can_undo(), use_container_width=True)
+with redo_col:
+    st.button("↪️ Redo", on_click=redo, disabled=not tasks.history.can_redo(), use_container_width=True)
+profiler.count_widgets(2)
+
+if 'conflict' in st.session_state:
+    st.warning(st.session_state.pop('conflict'))
+
 tab1, tab2 = st.tabs(["📋 All Tasks", "✏️ Manage Tasks"])
 
 with tab1:
+    search_text = st.text_input("🔍 Search", placeholder="Search titles and descriptions",
+                                on_change=reset_page)
+    
+    # Search hits come straight from the inverted index and are intersected
+    # with the status/priority indexes instead of rescanning the tasks
+    profiler.start("filter")
+    search_key = search_text.strip()
+    search_ids = (view_cache.get(('search', store.version, search_key), lambda: tasks.search.search(search_key))
+                  if search_key else None)
+    profiler.stop("filter")
+    
     # Filter options
-    col1, col2, col3 = st.columns([2, 2, 1])
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
     
     with col1:
-        filter_status = st.selectbox("Filter by Status", ["All", "Pending", "Completed"])
+        filter_status = st.selectbox("Filter by Status", ["All", "Pending", "Completed"], on_change=reset_page)
     
     with col2:
-        filter_priority = st.selectbox("Filter by Priority", ["All", "High", "Medium", "Low"])
+        filter_priority = st.selectbox("Filter by Priority", ["All", "High", "Medium", "Low"], on_change=reset_page)
     
     with col3:
-        sort_by = st.selectbox("Sort by", ["Created", "Priority", "Due Date"])
+        sort_by = st.selectbox("Sort by", ["Created", "Priority", "Due Date"], on_change=reset_page)
     
-    # Filter tasks
-    filtered_tasks = st.session_state.tasks.copy()
+    with col4:
+        page_size = st.selectbox("Per Page", PAGE_SIZES, index=1, on_change=reset_page)
     
-    if filter_status == "Pending":
-        filtered_tasks = [t for t in filtered_tasks if not t['completed']]
-    elif filter_status == "Completed":
-        filtered_tasks = [t for t in filtered_tasks if t['completed']]
+    profiler.count_widgets(5)
     
-    if filter_priority != "All":
-        filtered_tasks = [t for t in filtered_tasks if t['priority'] == filter_priority]
+    # Work out which page we are on and only fetch that slice from the store.
+    # Both lookups are memoized on the store version, so a rerun that didn't
+    # change any task (switching tabs, typing in a form) reuses the last result.
+    with profiler.section("filter"):
+        matching_count = view_cache.get(
+            ('count', store.version, filter_status, filter_priority, search_key),
+            lambda: store.count(filter_status, filter_priority, ids=search_ids))
+    page_count = max(1, (matching_count + page_size - 1) // page_size)
+    if 'page' not in st.session_state:
+        st.session_state.page = 1
+    st.session_state.page = min(max(st.session_state.page, 1), page_count)
     
-    # Sort tasks
-    if sort_by == "Priority":
-        priority_order = {'High': 0, 'Medium': 1, 'Low': 2}
-        filtered_tasks.sort(key=lambda x: priority_order[x['priority']])
-    elif sort_by == "Due Date":
-        filtered_tasks.sort(key=lambda x: x['due_date'] if x['due_date'] else '9999-99-99')
+    page_offset = (st.session_state.page - 1) * page_size
+    with profiler.section("sort"):
+        filtered_tasks = view_cache.get(
+            ('page', store.version, filter_status, filter_priority, sort_by, search_key, page_size, page_offset),
+            lambda: store.query(filter_status, filter_priority, sort_by,
+                                limit=page_size, offset=page_offset, ids=search_ids))
+    
+    # Batch actions
+    bcol1, bcol2 = st.columns([4, 1])
+    with bcol1:
+        batch_mode = st.toggle("☑️ Select multiple tasks", key="batch_mode")
+    with bcol2:
+        st.button("🧹 Purge Completed", on_click=purge_completed, disabled=not stats.completed,
+                  use_container_width=True)
+    profiler.count_widgets(2)
+    
+    if 'batch_result' in st.session_state:
+        st.success(st.session_state.pop('batch_result'))
     
     st.markdown("---")
     
-    if not filtered_tasks:
+    profiler.start("render")
+    if not filtered_tasks and search_ids is not None:
+        st.info("🔍 No tasks match your search.")
+    elif not filtered_tasks:
         st.info("📝 No tasks found. Add your first task using the sidebar!")
+    elif batch_mode:
+        # Selections live inside a form, so ticking boxes doesn't rerun the
+        # script; the chosen action is applied once on submit
+        with st.form("batch_form"):
+            for task in filtered_tasks:
+                label = f"{get_priority_color(task.priority_name)} {task.title}"
+                if task.completed:
+                    label = f"~~{label}~~"
+                if task.due:
+                    label += f" · 📅 {task.due_date}"
+                st.checkbox(label, key=f"sel_{task.id}")
+            profiler.count_widgets(len(filtered_tasks))
+            
+            st.markdown("---")
+            
+            acol1, acol2, acol3 = st.columns(3)
+            with acol1:
+                batch_action = st.selectbox("Action", BATCH_ACTIONS)
+            with acol2:
+                batch_priority = st.selectbox("New Priority", ["Low", "Medium", "High"])
+            with acol3:
+                batch_days = st.number_input("Shift Due Date by (days)", value=1, step=1)
+            
+            apply_to_all = st.checkbox(f"Apply to all {matching_count} matching tasks")
+            profiler.count_widgets(5)
+            
+            if st.form_submit_button("✅ Apply", use_container_width=True):
+                if apply_to_all:
+                    selected_ids = [t.id for t in store.query(filter_status, filter_priority, ids=search_ids)]
+                else:
+                    selected_ids = [t.id for t in filtered_tasks if st.session_state.get(f"sel_{t.id}")]
+                if selected_ids:
+                    apply_batch_action(batch_action, selected_ids, batch_priority, int(batch_days))
+                    st.session_state.batch_result = f"✅ {batch_action}: {len(selected_ids)} task(s)"
+                    st.rerun()
+                else:
+                    st.warning("⚠️ Select at least one task first!")
     else:
         for task in filtered_tasks:
             with st.container():
                 col1, col2, col3 = st.columns([0.5, 8, 1.5])
                 
                 with col1:
-                    checked = st.checkbox("", value=task['completed'], key=f"check_{task['id']}", 
-                                        label_visibility="collapsed")
-                    if checked != task['completed']:
-                        toggle_task(task['id'])
-                        st.rerun()
+                    # Callbacks run before the rerun the click already triggers,
+                    # so there's no second st.rerun() per toggle or delete.
+                    # The box is set from the task each run so an undo or a
+                    # change from another session shows up in it.
+                    st.session_state[f"check_{task.id}"] = task.completed
+                    st.checkbox("", key=f"check_{task.id}",
+                                label_visibility="collapsed", on_change=toggle_task, args=(task.id, task.version))
                 
                 with col2:
-                    title_style = "text-decoration: line-through; opacity: 0.6;" if task['completed'] else ""
-                    st.markdown(f"<h4 style='{title_style}'>{get_priority_color(task['priority'])} {task['title']}</h4>", 
+                    title_style = "text-decoration: line-through; opacity: 0.6;" if task.completed else ""
+                    is_overdue = stats.reminders.is_overdue(task.id)
+                    if is_overdue:
+                        title_style = "color: #e5484d;"
+                    st.markdown(f"<h4 style='{title_style}'>{get_priority_color(task.priority_name)} {task.title}</h4>", 
                               unsafe_allow_html=True)
                     
-                    if task['description']:
-                        st.markdown(f"*{task['description']}*")
+                    if task.description:
+                        st.markdown(f"*{task.description}*")
                     
                     info_parts = []
-                    if task['due_date']:
-                        info_parts.append(f"📅 Due: {task['due_date']}")
-                    info_parts.append(f"⏰ Created: {task['created_at']}")
+                    if task.due:
+                        info_parts.append(f"📅 Due: {task.due_date}")
+                        if is_overdue:
+                            info_parts.append(f"🚨 {describe_due(task.due)}")
+                        elif not task.completed and task.due - stats.today <= DUE_SOON_DAYS:
+                            info_parts.append(f"🔔 {describe_due(task.due)}")
+                    info_parts.append(f"⏰ Created: {task.created_at}")
                     st.caption(" | ".join(info_parts))
                 
                 with col3:
-                    if st.button("🗑️ Delete", key=f"del_{task['id']}", use_container_width=True):
-                        delete_task(task['id'])
-                        st.rerun()
+                    st.button("🗑️ Delete", key=f"del_{task.id}", on_click=delete_task, args=(task.id, task.version),
+                              use_container_width=True)
                 
                 st.markdown("---")
+        profiler.count_widgets(2 * len(filtered_tasks))
+    
+    if filtered_tasks:
+        # Page navigation
+        nav1, nav2, nav3 = st.columns([1, 3, 1])
+        with nav1:
+            st.button("⬅️ Previous", key="page_prev", on_click=change_page, args=(-1,),
+                      disabled=st.session_state.page <= 1, use_container_width=True)
+        with nav2:
+            first_shown = (st.session_state.page - 1) * page_size + 1
+            last_shown = first_shown + len(filtered_tasks) - 1
+            st.markdown(f"<div style='text-align: center;'>Page {st.session_state.page} of {page_count} "
+                        f"({first_shown}-{last_shown} of {matching_count} tasks)</div>", unsafe_allow_html=True)
+        with nav3:
+            st.button("Next ➡️", key="page_next", on_click=change_page, args=(1,),
+                      disabled=st.session_state.page >= page_count, use_container_width=True)
+        profiler.count_widgets(2)
+    profiler.stop("render")
 
-with tab2:
+with tab2, profiler.section("edit"):
     st.header("✏️ Edit Tasks")
     
-    if not st.session_state.tasks:
+    if not stats.total:
         st.info("📝 No tasks available to edit.")
     else:
-        task_titles = [f"{t['id']}: {t['title']}" for t in st.session_state.tasks]
-        selected_task_str = st.selectbox("Select a task to edit", task_titles)
+        edit_query = st.text_input("🔎 Find a task", placeholder="Start typing a title, or #id")
+        candidates = tasks.find(edit_query, PICKER_SIZE)
+        labels = {t.id: f"{t.title} (#{t.id})" for t in candidates}
+        selected_id = st.selectbox("Select a task to edit", list(labels), format_func=labels.get)
+        profiler.count_widgets(2)
         
-        if selected_task_str:
-            selected_id = int(selected_task_str.split(":")[0])
-            selected_task = next((t for t in st.session_state.tasks if t['id'] == selected_id), None)
+        if not candidates:
+            st.info("🔍 No task titles match that.")
+        elif len(candidates) == PICKER_SIZE:
+            st.caption(f"Showing the first {PICKER_SIZE} matches, keep typing to narrow them down.")
+        
+        if selected_id is not None:
+            selected_task = store.get(selected_id)
             
             if selected_task:
                 st.markdown("---")
                 
+                # The version the form was last shown with, so an update made
+                # from a stale copy is caught instead of overwriting newer edits
+                base_id, base_version = st.session_state.get('edit_base', (None, None))
+                expected_version = base_version if base_id == selected_id else selected_task.version
+                
                 with st.form("edit_task_form"):
-                    edit_title = st.text_input("Task Title*", value=selected_task['title'])
-                    edit_description = st.text_area("Description", value=selected_task['description'])
+                    edit_title = st.text_input("Task Title*", value=selected_task.title)
+                    edit_description = st.text_area("Description", value=selected_task.description)
                     edit_priority = st.selectbox("Priority", ["Low", "Medium", "High"], 
-                                                index=["Low", "Medium", "High"].index(selected_task['priority']))
+                                                index=["Low", "Medium", "High"].index(selected_task.priority_name))
                     
                     edit_due_date = None
-                    if selected_task['due_date']:
+                    if selected_task.due:
                         edit_due_date = st.date_input("Due Date", 
-                                                     value=datetime.strptime(selected_task['due_date'], '%Y-%m-%d'))
+                                                     value=date.fromordinal(selected_task.due))
                     else:
                         edit_due_date = st.date_input("Due Date", value=None)
                     
@@ -196,15 +522,41 @@ with tab2:
                         update_button = st.form_submit_button("💾 Update Task", use_container_width=True)
                     with col2:
                         cancel_button = st.form_submit_button("❌ Cancel", use_container_width=True)
+                    profiler.count_widgets(6)
                     
                     if update_button:
                         if edit_title.strip():
-                            update_task(selected_id, edit_title, edit_description, edit_priority, edit_due_date)
-                            st.success("✅ Task updated successfully!")
-                            st.rerun()
+                            if update_task(selected_id, edit_title, edit_description, edit_priority,
+                                           edit_due_date, expected_version=expected_version):
+                                st.success("✅ Task updated successfully!")
+                                st.rerun()
+                            else:
+                                st.error(st.session_state.pop('conflict'))
+                                selected_task = store.get(selected_id) or selected_task
                         else:
                             st.error("⚠️ Task title is required!")
+                
+                st.session_state.edit_base = (selected_id, selected_task.version)
 
 #Footer
 st.markdown("---")
 st.markdown("<div style='text-align: center; color: gray;'>Developed with ❤️ using Streamlit</div>", unsafe_allow_html=True)
+
+# Rerun profile panel
+if profiler.enabled:
+    if 'profile_history' not in st.session_state:
+        st.session_state.profile_history = ProfileHistory()
+    profile_history = st.session_state.profile_history
+    
+    profile_record = profiler.finish(tasks=stats.total, shown=len(filtered_tasks),
+                                     cache_hits=view_cache.hits, cache_misses=view_cache.misses)
+    profile_history.add(profile_record)
+    if os.environ.get("TODO_PROFILE_LOG"):
+        append_log(os.environ["TODO_PROFILE_LOG"], profile_record)
+    
+    with st.expander(f"⏱️ Rerun Profile ({profile_record['total_ms']:.1f} ms, "
+                     f"{profile_record['widgets']} widgets)"):
+        st.table(profile_history.summary())
+        st.line_chart({"total_ms": [r['total_ms'] for r in profile_history.records]})
+        st.download_button("💾 Download timings (JSON)", profile_history.to_json(),
+                           file_name="rerun_profile.json", mime="application/json")
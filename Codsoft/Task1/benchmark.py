@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from task_core import TaskManager, TaskStore, open_store
+from task_record import PRIORITIES, Task
+
+# Benchmarks for the To-Do task core, no Streamlit needed.
+#
+#   python benchmark.py                       # 10k, 100k and 1M tasks
+#   python benchmark.py --sizes 10000 --json results.json
+#   python benchmark.py --sqlite              # same, on a SQLite store
+#
+# For every size it builds a TaskManager holding that many tasks and runs each
+# operation for about --seconds, reporting operations per second. Peak memory
+# is measured with tracemalloc in a separate short run so the tracing doesn't
+# skew the timings: "build" is the whole manager, the rest is the extra peak
+# while the operation runs.
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+WORDS = ("buy milk call mom write report fix bug plan trip read book pay rent clean room "
+         "email team review code book flight water plants renew passport").split()
+MEMORY_REPS = 50
+
+
+def make_tasks(count, seed=1):
+    rng = random.Random(seed)
+    today = date.today().toordinal()
+    tasks = []
+    for i in range(count):
+        title = " ".join(rng.choices(WORDS, k=3)) + f" {i}"
+        due = today + rng.randrange(-30, 90) if rng.random() < 0.6 else 0
+        tasks.append(Task(title, "", rng.randrange(len(PRIORITIES)), due, rng.random() < 0.3))
+    return tasks
+
+
+def build(count, db_path=None):
+    store = open_store(db_path) if db_path else TaskStore()
+    store.add_many(make_tasks(count))
+    return TaskManager(store)
+
+
+# Each operation is (name, fn(manager, i)). ids are picked spread over the
+# whole store so the in-memory and SQLite runs touch the same tasks.
+def operations(count):
+    today = date.today().toordinal()
+
+    def pick(i):
+        return (i * 7919) % count + 1
+
+    return [
+        ("add", lambda m, i: m.add(f"new task {i}", "", i % 3, today + i % 30)),
+        ("update", lambda m, i: m.update(pick(i), title=f"renamed task {i}")),
+        ("toggle", lambda m, i: m.toggle(pick(i))),
+        # alternating, so there is always a step to undo or redo
+        ("undo/redo", lambda m, i: m.undo() if i % 2 == 0 else m.redo()),
+        ("filter", lambda m, i: m.count("Pending", PRIORITIES[i % 3])),
+        ("search", lambda m, i: m.search.search(WORDS[i % len(WORDS)][:3])),
+        ("sort by priority", lambda m, i: m.query(sort_by="Priority", limit=25, offset=25 * (i % 4))),
+        ("sort by due date", lambda m, i: m.query(sort_by="Due Date", limit=25)),
+        ("stats", lambda m, i: (m.sync(), m.stats.snapshot())),
+        ("delete", lambda m, i: m.delete(pick(i))),
+    ]
+
+
+# Run fn for about seconds (but at most max_reps times, so delete can't empty
+# the store) and return (ops/sec, reps)
+def time_op(manager, fn, seconds, max_reps):
+    reps = 0
+    start = time.perf_counter()
+    while True:
+        fn(manager, reps)
+        reps += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds or reps >= max_reps:
+            return reps / elapsed, reps
+
+
+# Extra peak memory while running fn a few times, in bytes
+def peak_memory(manager, fn, offset):
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(offset, offset + MEMORY_REPS):
+            fn(manager, i)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(count, seconds, measure_memory, sqlite_dir=None):
+    db_path = os.path.join(sqlite_dir, f"bench_{count}.db") if sqlite_dir else None
+    results = []
+
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    manager = build(count, db_path)
+    build_time = time.perf_counter() - start
+    build_peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+    tracemalloc.stop()
+    # for build, ops/sec is tasks loaded per second
+    results.append({'size': count, 'operation': "build", 'ops_per_sec': round(count / build_time, 1),
+                    'peak_kb': build_peak // 1024 if measure_memory else None})
+
+    for name, fn in operations(count):
+        ops_per_sec, reps = time_op(manager, fn, seconds, max(count // 10 - MEMORY_REPS, 1))
+        peak = peak_memory(manager, fn, reps) if measure_memory else None
+        results.append({'size': count, 'operation': name, 'ops_per_sec': round(ops_per_sec, 1),
+                        'peak_kb': peak // 1024 if measure_memory else None})
+    return results
+
+
+def print_results(results):
+    print(f"{'tasks':>10}  {'operation':<18} {'ops/sec':>14} {'peak KB':>10}")
+    for row in results:
+        peak = "-" if row['peak_kb'] is None else f"{row['peak_kb']:,}"
+        print(f"{row['size']:>10,}  {row['operation']:<18} {row['ops_per_sec']:>14,.1f} {peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the To-Do task core")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="task counts to benchmark (default: 10000 100000 1000000)")
+    parser.add_argument("--seconds", type=float, default=0.5, help="time to spend on each operation")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory runs")
+    parser.add_argument("--sqlite", action="store_true", help="benchmark the SQLite store instead")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as sqlite_dir:
+        for count in args.sizes:
+            rows = run_size(count, args.seconds, not args.no_memory, sqlite_dir if args.sqlite else None)
+            print_results(rows)
+            print()
+            results.extend(rows)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+import zlib
+
+from task_record import Task
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Append-only journal for the in-memory TaskStore.
+#
+# Every mutation is one line in journal.log: "<crc32> <json>\n", where the
+# JSON is [seq, op, ...args]. Lines are flushed straight away and fsync'd in
+# batches. Once enough records pile up the whole store is written to
+# snapshot.ndjson (temp file + fsync + rename) and the log is truncated, so
+# startup only has to read the latest snapshot plus a short tail.
+#
+# A crash can leave a half-written last line. Loading stops at the first line
+# that is incomplete or fails its checksum and cuts the log back to there.
+#
+# Only one TaskJournal at a time may use a directory: it holds an exclusive
+# lock on journal.lock until it is closed, and a second one fails with
+# JournalLockedError. Two writers would hand out the same ids and sequence
+# numbers, and a compaction by one would throw away the other's records.
+
+SNAPSHOT_NAME = "snapshot.ndjson"
+LOG_NAME = "journal.log"
+LOCK_NAME = "journal.lock"
+SYNC_EVERY = 32  # records per fsync
+SYNC_INTERVAL = 1.0  # ...or at most this many seconds after a record is written
+COMPACT_EVERY = 10000  # records in the log before it is folded into a snapshot
+
+
+def encode_task(task):
+    return [task.id, task.title, task.description, task.priority, task.due, task.completed, task.created]
+
+
+def decode_task(values):
+    task_id, title, description, priority, due, completed, created = values
+    return Task(title, description, priority, due, completed, created, task_id)
+
+
+def _frame(payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x " % zlib.crc32(data) + data + b"\n"
+
+
+# Raised when another TaskJournal (in this or another process) has the directory open
+class JournalLockedError(Exception):
+    pass
+
+
+def _unframe(line):
+    if len(line) < 10 or line[8:9] != b" ":
+        return None
+    data = line[9:]
+    try:
+        if int(line[:8], 16) != zlib.crc32(data):
+            return None
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+class TaskJournal:
+    def __init__(self, directory, sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL,
+                 compact_every=COMPACT_EVERY):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.seq = 0  # sequence number of the last record written
+        self.log_records = 0  # records in the log since the last snapshot
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.dropped_bytes = 0  # size of a torn tail cut off during load
+        self.log = None
+        self.timer = None  # fsyncs records that no later append got round to
+        self.write_lock = threading.Lock()  # the timer runs on its own thread
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = self._lock_directory()
+
+    def _lock_directory(self):
+        lock_file = open(os.path.join(self.directory, LOCK_NAME), "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise JournalLockedError(f"The journal in {self.directory} is already open")
+        return lock_file
+
+    # ---------- Loading ----------
+
+    # Rebuild store from the snapshot and the log tail, then open the log for
+    # appending. The store's journal must not be attached yet.
+    def load(self, store):
+        snapshot_seq = self._load_snapshot(store)
+        self.seq = snapshot_seq
+        good_end = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    record = _unframe(line[:-1]) if line.endswith(b"\n") else None
+                    if record is None:
+                        break
+                    good_end += len(line)
+                    seq = record[0]
+                    # Records already folded into the snapshot (a crash between
+                    # writing the snapshot and truncating the log) are skipped
+                    if seq > snapshot_seq:
+                        self._apply(store, record)
+                        self.seq = seq
+                        self.log_records += 1
+            size = os.path.getsize(self.log_path)
+            if good_end < size:
+                self.dropped_bytes = size - good_end
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(good_end)
+                    f.flush()
+                    os.fsync(f.fileno())
+        self.log = open(self.log_path, "ab")
+        return store
+
+    def _load_snapshot(self, store):
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            tasks = [decode_task(json.loads(line)) for line in f if line.strip()]
+        store.restore(tasks, header['next_id'])
+        return header['seq']
+
+    def _apply(self, store, record):
+        op = record[1]
+        if op == "add":
+            store.restore([decode_task(values) for values in record[2]])
+        elif op == "update":
+            store.update(record[2], **record[3])
+        elif op == "toggle":
+            store.toggle(record[2])
+        elif op == "delete":
+            store.delete(record[2])
+
+    # ---------- Writing ----------
+
+    def append(self, op, *args):
+        with self.write_lock:
+            self.seq += 1
+            self.log.write(_frame([self.seq, op, *args]))
+            self.log.flush()
+            self.log_records += 1
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync()
+            elif self.timer is None:
+                # Nothing may come after this record, so don't leave it to the next append
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def record_add(self, tasks):
+        self.append("add", [encode_task(task) for task in tasks])
+
+    def record_update(self, task_id, fields):
+        self.append("update", task_id, fields)
+
+    def record_toggle(self, task_id):
+        self.append("toggle", task_id)
+
+    def record_delete(self, task_id):
+        self.append("delete", task_id)
+
+    def sync(self):
+        with self.write_lock:
+            self._sync()
+
+    def _sync(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.unsynced and self.log is not None:
+            os.fsync(self.log.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def needs_compaction(self):
+        return self.log_records >= self.compact_every
+
+    # Write every task to a fresh snapshot and start an empty log
+    def compact(self, tasks, next_id):
+        with self.write_lock:
+            self._compact(tasks, next_id)
+
+    def _compact(self, tasks, next_id):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({'seq': self.seq, 'next_id': next_id}) + "\n")
+            for task in tasks:
+                f.write(json.dumps(encode_task(task), ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._sync_directory()
+        self.log.truncate(0)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.log_records = 0
+        self.unsynced = 0
+        self._sync()  # only cancels the timer now
+
+    def _sync_directory(self):
+        # Make the rename itself durable (not supported on Windows)
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        with self.write_lock:
+            if self.log is not None:
+                self._sync()
+                self.log.close()
+                self.log = None
+            if self.lock_file is not None:
+                self.lock_file.close()  # releases the directory lock
+                self.lock_file = None
@@ -0,0 +1,93 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Opt-in timing for one Streamlit rerun. Each part of the script runs inside
+# profiler.section(name); finish() turns the run into a record that goes into
+# a rolling history. When profiling is off every call is a cheap no-op.
+
+SECTIONS = ["sidebar", "filter", "sort", "render", "edit"]
+HISTORY_SIZE = 50
+
+
+class RerunProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = {}
+        self.widgets = 0
+        self.running = {}
+        self.started = time.perf_counter()
+
+    def section(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    # start/stop are for sections that span a long if/else block
+    def start(self, name):
+        if self.enabled:
+            self.running[name] = time.perf_counter()
+
+    def stop(self, name):
+        if self.enabled and name in self.running:
+            elapsed = time.perf_counter() - self.running.pop(name)
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def count_widgets(self, n=1):
+        if self.enabled:
+            self.widgets += n
+
+    # Build the record for this rerun (times in milliseconds)
+    def finish(self, **extra):
+        record = {
+            'timestamp': time.time(),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'widgets': self.widgets,
+        }
+        for name in SECTIONS:
+            record[f'{name}_ms'] = round(self.timings.get(name, 0.0) * 1000, 3)
+        record.update(extra)
+        return record
+
+
+class ProfileHistory:
+    def __init__(self, size=HISTORY_SIZE):
+        self.records = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        self.records.append(record)
+
+    def to_json(self):
+        return json.dumps(list(self.records), indent=2)
+
+    # Mean and worst time per section over the kept history
+    def summary(self):
+        rows = []
+        for name in SECTIONS + ["total"]:
+            values = [r[f'{name}_ms'] for r in self.records]
+            if values:
+                rows.append({
+                    'section': name,
+                    'mean_ms': round(sum(values) / len(values), 3),
+                    'max_ms': round(max(values), 3),
+                    'last_ms': values[-1],
+                })
+        return rows
+
+
+# Append one record as a JSON line, for tracking regressions across runs
+def append_log(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
@@ -0,0 +1,89 @@
+import heapq
+from datetime import date
+
+# Due-date reminders for pending tasks. Dates are day ordinals, like Task.due.
+# Tasks not due yet sit in a min-heap of (due, id); once their day has passed
+# advance() moves them into overdue. Heap entries are dropped lazily: one is
+# only live while upcoming[id] still matches it, so changing or removing a
+# task is O(1) and the stale entry is skipped when it reaches the top.
+
+
+class ReminderQueue:
+    def __init__(self, today=None):
+        self.today = today or date.today().toordinal()
+        self.heap = []
+        self.upcoming = {}  # id -> due, for tasks due today or later
+        self.overdue = {}  # id -> due, for tasks whose due date has passed
+
+    def __len__(self):
+        return len(self.upcoming) + len(self.overdue)
+
+    def __contains__(self, task_id):
+        return task_id in self.upcoming or task_id in self.overdue
+
+    def is_overdue(self, task_id):
+        return task_id in self.overdue
+
+    def push(self, task_id, due):
+        self.discard(task_id)
+        if due < self.today:
+            self.overdue[task_id] = due
+        else:
+            self.upcoming[task_id] = due
+            heapq.heappush(self.heap, (due, task_id))
+
+    def discard(self, task_id):
+        self.overdue.pop(task_id, None)
+        if self.upcoming.pop(task_id, None) is not None:
+            # Rebuild the heap once stale entries outnumber live ones
+            if len(self.heap) > 2 * len(self.upcoming) + 64:
+                self.heap = [(due, i) for i, due in self.upcoming.items()]
+                heapq.heapify(self.heap)
+
+    # Move tasks whose due date has passed into overdue
+    def advance(self, today=None):
+        self.today = today or date.today().toordinal()
+        while self.heap and self.heap[0][0] < self.today:
+            due, task_id = heapq.heappop(self.heap)
+            if self.upcoming.get(task_id) == due:
+                del self.upcoming[task_id]
+                self.overdue[task_id] = due
+
+    def _pop_stale(self):
+        while self.heap and self.upcoming.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    # (due, id) of the task that comes up next, or None
+    def next_due(self):
+        self._pop_stale()
+        return self.heap[0] if self.heap else None
+
+    # (due, id) of the tasks due in the next days days (0 = today only), soonest
+    # first. Walks the heap as a tree from the root and stops at the first entry
+    # past the window, so it only looks at the k matches and their children.
+    # A task re-added with the same date can have two live-looking entries,
+    # hence seen.
+    def due_within(self, days, limit=None):
+        self._pop_stale()
+        last_day = self.today + days
+        result = []
+        seen = set()
+        frontier = [(self.heap[0], 0)] if self.heap else []
+        while frontier and (limit is None or len(result) < limit):
+            entry, i = heapq.heappop(frontier)
+            if entry[0] > last_day:
+                break
+            if self.upcoming.get(entry[1]) == entry[0] and entry[1] not in seen:
+                seen.add(entry[1])
+                result.append(entry)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap):
+                    heapq.heappush(frontier, (self.heap[child], child))
+        return result
+
+    # (due, id) of overdue tasks, most overdue first
+    def overdue_tasks(self, limit=None):
+        items = ((due, task_id) for task_id, due in self.overdue.items())
+        if limit is None:
+            return sorted(items)
+        return heapq.nsmallest(limit, items)
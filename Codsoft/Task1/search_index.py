@@ -0,0 +1,156 @@
+import re
+from bisect import bisect_left, insort
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SORT_CHARS = 40  # title key characters a bulk sort compares before settling ties
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+# Keys a title can be found under in the type-ahead picker: the lowercased
+# title from the start of each of its words, so "Buy milk" is found by typing
+# "buy m" as well as "milk". Returned as the text and the offsets the keys
+# start at, so a long title isn't copied once per word.
+def title_keys(title):
+    text = " ".join(title.lower().split())
+    offsets = [m.start() for m in TOKEN_PATTERN.finditer(text)]
+    if not offsets or offsets[0] != 0:
+        offsets.insert(0, 0)
+    return text, offsets
+
+
+# An entry of SearchIndex.titles is (text, offset, id); it sorts by the key
+# text[offset:] and then the id. The key is only sliced out to compare it.
+def _entry_key(entry):
+    text, offset, task_id = entry
+    return text[offset:], task_id
+
+
+# Index of the first entry not below key, a (key text, id) or (key text,) tuple
+def _find_title(titles, key):
+    lo, hi = 0, len(titles)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _entry_key(titles[mid]) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+# Sort entries on the first SORT_CHARS characters of their keys, then put each
+# run that ties on those in full order, so no sort holds every whole key at once
+def _sort_titles(titles):
+    def head(entry):
+        return entry[0][entry[1]:entry[1] + SORT_CHARS]
+    titles.sort(key=head)
+    start = 0
+    for i in range(1, len(titles) + 1):
+        if i == len(titles) or head(titles[i]) != head(titles[start]):
+            if i - start > 1:
+                titles[start:i] = sorted(titles[start:i], key=_entry_key)
+            start = i
+
+
+# In-memory inverted index over task titles and descriptions.
+# postings maps each term to the set of task ids that contain it, and terms is
+# kept sorted so prefix lookups are a bisect plus a short forward walk.
+# titles is a second sorted list of (title, key offset, id) entries for the
+# edit picker, each standing for the title from that offset on.
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}
+        self.terms = []
+        self.doc_terms = {}  # id -> set of terms, so removal doesn't re-tokenize
+        self.titles = []
+        self.doc_titles = {}  # id -> (title text, key offsets)
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, task):
+        for term in self._add_terms(task):
+            insort(self.terms, term)
+        text, offsets = self.doc_titles[task.id] = title_keys(task.title)
+        for offset in offsets:
+            entry = (text, offset, task.id)
+            self.titles.insert(_find_title(self.titles, _entry_key(entry)), entry)
+
+    # Index many tasks at once: the sorted lists are rebuilt once at the end
+    # instead of being insorted into per task
+    def add_many(self, tasks):
+        new_terms = False
+        for task in tasks:
+            if self._add_terms(task):
+                new_terms = True
+            text, offsets = self.doc_titles[task.id] = title_keys(task.title)
+            self.titles.extend((text, offset, task.id) for offset in offsets)
+        if new_terms:
+            self.terms = sorted(self.postings)
+        _sort_titles(self.titles)
+
+    # Record task's terms in the postings and return the terms that are new
+    def _add_terms(self, task):
+        terms = set(tokenize(task.title)) | set(tokenize(task.description))
+        self.doc_terms[task.id] = terms
+        new_terms = []
+        for term in terms:
+            ids = self.postings.get(term)
+            if ids is None:
+                self.postings[term] = ids = set()
+                new_terms.append(term)
+            ids.add(task.id)
+        return new_terms
+
+    def remove(self, task_id):
+        for term in self.doc_terms.pop(task_id, ()):
+            ids = self.postings[term]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+        text, offsets = self.doc_titles.pop(task_id, ("", ()))
+        for offset in offsets:
+            del self.titles[_find_title(self.titles, (text[offset:], task_id))]
+
+    def update(self, task):
+        self.remove(task.id)
+        self.add(task)
+
+    # Ids of every document with a term starting with prefix
+    def prefix_ids(self, prefix):
+        result = set()
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            result |= self.postings[self.terms[i]]
+            i += 1
+        return result
+
+    # Every query word has to match a whole term or the start of one.
+    # Returns the set of matching task ids.
+    def search(self, text):
+        result = None
+        # Longer words usually match fewer terms, so start with them
+        for word in sorted(set(tokenize(text)), key=len, reverse=True):
+            ids = self.prefix_ids(word)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result if result is not None else set()
+
+    # Type-ahead lookup for the edit picker: ids of at most limit tasks whose
+    # title, or a word in it, starts with text, in alphabetical order of the
+    # matched part. Only the matches themselves are visited.
+    def complete(self, text, limit):
+        prefix = " ".join(text.lower().split())
+        result = {}
+        i = _find_title(self.titles, (prefix,))
+        while i < len(self.titles) and len(result) < limit:
+            text, offset, task_id = self.titles[i]
+            if not text.startswith(prefix, offset):
+                break
+            result[task_id] = None
+            i += 1
+        return list(result)
@@ -0,0 +1,321 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+from task_record import NO_DUE_DATE, PRIORITY_RANK, ConflictError, Task
+
+# Columns mirror the Task record: priority is its rank, so ORDER BY priority
+# gives High, Medium, Low; due is a date ordinal and created is epoch seconds.
+# A task with no due date is stored with NO_DUE_KEY, a day after the last one
+# a date can have, rather than NULL: it sorts last on its own, so ORDER BY
+# due, id can be read straight off an index.
+#
+# Every status x priority filter has an index that starts with the filtered
+# columns and then has the sort column (the rowid id comes last implicitly),
+# so a page of any view is an index range scan with no sorting step and takes
+# the same time however big the table is.
+#
+# The same database file can be shared by many sessions and app replicas.
+# store_meta holds a global version that every write transaction bumps; each
+# row keeps the version of its last change, and deletes leave a tombstone in
+# deleted_tasks. That gives per-task optimistic concurrency checks and a cheap
+# "what changed since version N" query for sessions to poll.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL,
+    due INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS idx_tasks_by_priority ON tasks (priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed_priority ON tasks (completed, priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (due);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed_due ON tasks (completed, due);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority, due);
+CREATE INDEX IF NOT EXISTS idx_tasks_filter ON tasks (completed, priority, due);
+CREATE INDEX IF NOT EXISTS idx_tasks_version ON tasks (version);
+CREATE TABLE IF NOT EXISTS deleted_tasks (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_version ON deleted_tasks (version);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('forgotten', 0);
+"""
+
+NO_DUE_KEY = date.max.toordinal() + 1
+
+# Databases made before NO_DUE_KEY stored a missing due date as NULL
+MIGRATE_NULL_DUE = f"UPDATE tasks SET due = {NO_DUE_KEY} WHERE due IS NULL"
+
+COLUMNS = "id, title, description, priority, due, completed, created, version"
+
+ORDER_BY = {
+    "Created": "id",
+    "Priority": "priority, id",
+    "Due Date": "due, id",
+}
+
+BUSY_TIMEOUT = 10.0  # seconds to wait for another writer before giving up
+# Tombstones kept in deleted_tasks. Past this the oldest half is dropped, and
+# store_meta 'forgotten' records the newest version dropped: a session that
+# has not synced since then has to reread every task (see changes_since).
+MAX_TOMBSTONES = 10000
+
+
+def _row_to_task(row):
+    due = NO_DUE_DATE if row[4] in (NO_DUE_KEY, None) else row[4]
+    return Task(row[1], row[2], row[3], due, bool(row[5]), row[6], row[0], row[7])
+
+
+def _task_to_row(task):
+    return (task.title, task.description or '', task.priority, task.due or NO_DUE_KEY,
+            int(task.completed), task.created)
+
+
+# SQLite-backed task store with the same interface as TaskStore in app.py.
+# Filtering, sorting and paging are pushed down into indexed SQL queries.
+class SQLiteTaskStore:
+    def __init__(self, path):
+        self.path = path
+        # Streamlit reruns the script on different threads, so allow sharing.
+        # Transactions are managed by hand (isolation_level=None) so writes can
+        # take the lock up front with BEGIN IMMEDIATE.
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(MIGRATE_NULL_DUE)
+        self.version = self._current_version()  # used to key cached views
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def _current_version(self):
+        return self.conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+    # Call inside a write transaction after adding tombstones
+    def _prune_tombstones(self):
+        if self.conn.execute("SELECT COUNT(*) FROM deleted_tasks").fetchone()[0] <= MAX_TOMBSTONES:
+            return
+        cutoff = self.conn.execute("SELECT version FROM deleted_tasks ORDER BY version DESC LIMIT 1 OFFSET ?",
+                                   (MAX_TOMBSTONES // 2,)).fetchone()
+        self.conn.execute("DELETE FROM deleted_tasks WHERE version <= ?", cutoff)
+        self.conn.execute("UPDATE store_meta SET value = ? WHERE key = 'forgotten'", cutoff)
+
+    # One write transaction. BEGIN IMMEDIATE takes the write lock before
+    # anything is read, so the version bump and id allocation can't race with
+    # another session; the new version is handed to the body to stamp rows with.
+    @contextmanager
+    def _write(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._current_version() + 1
+            self.conn.execute("UPDATE store_meta SET value = ? WHERE key = 'version'", (version,))
+            yield version
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self.version = version
+
+    def _check_version(self, task_id, expected_version):
+        row = self.conn.execute("SELECT version FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return False
+        if expected_version is not None and row[0] != expected_version:
+            raise ConflictError(f"Task {task_id} was changed by someone else")
+        return True
+
+    def _where(self, status, priority, ids=None):
+        clauses = []
+        params = []
+        if ids is not None:
+            # Restrict to a set of ids (e.g. search hits) without building a huge IN list
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(ids)))
+        if status == "Pending":
+            clauses.append("completed = 0")
+        elif status == "Completed":
+            clauses.append("completed = 1")
+        if priority != "All":
+            clauses.append("priority = ?")
+            params.append(PRIORITY_RANK[priority])
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def get(self, task_id):
+        row = self.conn.execute(
+            f"SELECT {COLUMNS} FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        return _row_to_task(row) if row else None
+
+    def add(self, task):
+        with self._write() as version:
+            cur = self.conn.execute(
+                "INSERT INTO tasks (title, description, priority, due, completed, created, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*_task_to_row(task), version)
+            )
+        task.id = cur.lastrowid
+        task.version = version
+        return task
+
+    # Insert a batch in one transaction, with the ids allocated up front as a block
+    def add_many(self, tasks):
+        with self._write() as version:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+            first_id = (row[0] if row else 0) + 1
+            for task_id, task in enumerate(tasks, first_id):
+                task.id = task_id
+                task.version = version
+            self.conn.executemany(
+                "INSERT INTO tasks (id, title, description, priority, due, completed, created, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(task.id, *_task_to_row(task), version) for task in tasks]
+            )
+        return tasks
+
+    # Put deleted tasks back under their old ids (undo of a delete)
+    def undelete(self, tasks):
+        with self._write() as version:
+            for task in tasks:
+                task.version = version
+            self.conn.executemany(
+                "INSERT INTO tasks (id, title, description, priority, due, completed, created, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(task.id, *_task_to_row(task), version) for task in tasks]
+            )
+            self.conn.execute("DELETE FROM deleted_tasks WHERE id IN (SELECT value FROM json_each(?))",
+                              (json.dumps([task.id for task in tasks]),))
+        return tasks
+
+    def iter_tasks(self):
+        for row in self.conn.execute(f"SELECT {COLUMNS} FROM tasks ORDER BY id"):
+            yield _row_to_task(row)
+
+    # fields use the Task attribute names, which are also the column names
+    def _update(self, task_id, fields, version):
+        fields = dict(fields)
+        if 'due' in fields:
+            fields['due'] = fields['due'] or NO_DUE_KEY
+        if 'completed' in fields:
+            fields['completed'] = int(fields['completed'])
+        fields['version'] = version
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.conn.execute(
+            f"UPDATE tasks SET {assignments} WHERE id = ?",
+            (*fields.values(), task_id)
+        )
+
+    def update(self, task_id, expected_version=None, **fields):
+        with self._write() as version:
+            if not self._check_version(task_id, expected_version):
+                return None
+            self._update(task_id, fields, version)
+            # read back inside the transaction, so the task is as this write left it
+            task = self.get(task_id)
+        return task
+
+    # changes maps task id -> fields; everything is applied in one transaction
+    def update_many(self, changes):
+        with self._write() as version:
+            for task_id, fields in changes.items():
+                self._update(task_id, fields, version)
+            tasks = self.query(ids=changes.keys())
+        return tasks
+
+    def toggle(self, task_id, expected_version=None):
+        with self._write() as version:
+            if not self._check_version(task_id, expected_version):
+                return None
+            self.conn.execute("UPDATE tasks SET completed = 1 - completed, version = ? WHERE id = ?",
+                              (version, task_id))
+            task = self.get(task_id)
+        return task
+
+    # Deleted tasks are read inside the transaction and come back stamped with
+    # the delete's version, like the tasks the other writes return
+    def delete(self, task_id, expected_version=None):
+        with self._write() as version:
+            if not self._check_version(task_id, expected_version):
+                return None
+            task = self.get(task_id)
+            self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self.conn.execute("INSERT OR REPLACE INTO deleted_tasks (id, version) VALUES (?, ?)",
+                              (task_id, version))
+            self._prune_tombstones()
+        task.version = version
+        return task
+
+    def delete_many(self, task_ids):
+        id_list = json.dumps(list(task_ids))
+        with self._write() as version:
+            tasks = self.query(ids=task_ids)
+            self.conn.execute("INSERT OR REPLACE INTO deleted_tasks (id, version) "
+                              "SELECT id, ? FROM tasks WHERE id IN (SELECT value FROM json_each(?))",
+                              (version, id_list))
+            self.conn.execute("DELETE FROM tasks WHERE id IN (SELECT value FROM json_each(?))", (id_list,))
+            self._prune_tombstones()
+        for task in tasks:
+            task.version = version
+        return tasks
+
+    def purge_completed(self):
+        with self._write() as version:
+            tasks = self.query(status="Completed")
+            self.conn.execute("INSERT OR REPLACE INTO deleted_tasks (id, version) "
+                              "SELECT id, ? FROM tasks WHERE completed = 1", (version,))
+            self.conn.execute("DELETE FROM tasks WHERE completed = 1")
+            self._prune_tombstones()
+        for task in tasks:
+            task.version = version
+        return tasks
+
+    # Tasks added or changed and ids deleted after the given store version,
+    # plus the version they bring the caller up to. Both lookups are index
+    # range scans, so polling costs nothing when nothing has changed. When
+    # tombstones the caller hasn't seen have been pruned, changed and deleted
+    # are None and the caller has to compare every task instead.
+    def changes_since(self, version):
+        self.conn.execute("BEGIN")
+        try:
+            current = self._current_version()
+            forgotten = self.conn.execute("SELECT value FROM store_meta WHERE key = 'forgotten'").fetchone()[0]
+            if version < forgotten:
+                self.version = current
+                return None, None, current
+            changed = [_row_to_task(row) for row in self.conn.execute(
+                f"SELECT {COLUMNS} FROM tasks WHERE version > ? ORDER BY id", (version,))]
+            deleted = [row[0] for row in self.conn.execute(
+                "SELECT id FROM deleted_tasks WHERE version > ?", (version,))]
+        finally:
+            self.conn.execute("COMMIT")
+        self.version = current
+        return changed, deleted, current
+
+    def count(self, status="All", priority="All", ids=None):
+        where, params = self._where(status, priority, ids)
+        return self.conn.execute(f"SELECT COUNT(*) FROM tasks{where}", params).fetchone()[0]
+
+    def query(self, status="All", priority="All", sort_by="Created", limit=None, offset=0, ids=None):
+        where, params = self._where(status, priority, ids)
+        sql = f"SELECT {COLUMNS} FROM tasks{where} ORDER BY {ORDER_BY[sort_by]}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [_row_to_task(row) for row in self.conn.execute(sql, params)]
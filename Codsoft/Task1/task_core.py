@@ -0,0 +1,647 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from itertools import islice
+
+from journal import TaskJournal
+from reminders import ReminderQueue
+from search_index import SearchIndex
+from sqlite_store import SQLiteTaskStore
+import task_io
+from task_record import NO_DUE_DATE, PRIORITIES, PRIORITY_RANK, ConflictError, Task
+from undo_history import UNDO_LIMIT_BYTES, UndoHistory, field_changes, invert
+
+# The To-Do app without the UI: the task store, the running stats, the search
+# index and the undo history, plus TaskManager which ties them together. The
+# Streamlit app keeps one TaskManager per session and only turns widget values
+# into calls on it; benchmark.py drives the same code with no Streamlit at all.
+
+
+# Task changes a shared TaskStore remembers for the sessions' sync(); a session
+# that has fallen further behind rereads every task instead
+MAX_CHANGES = 10000
+
+
+# Run a TaskStore method while holding the store's lock
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Task store: keeps every task in an id -> task map plus a few secondary indexes,
+# so lookups, toggles and deletes don't have to walk the whole list.
+# A journaled store is shared by every session in the process, so all access
+# goes through one lock, and (for a shared store only) changed holds the store
+# version of each task's last change (deleted ones too) for the other sessions
+# to pick up.
+class TaskStore:
+    def __init__(self, shared=False):
+        self.tasks = {}  # id -> Task, insertion order is creation order
+        self.by_status = {False: set(), True: set()}
+        self.by_priority = [set() for _ in PRIORITIES]  # indexed by priority rank
+        self.by_due_date = {}  # due date ordinal (NO_DUE_DATE for none) -> set of ids
+        self.next_id = 1
+        self.version = 0  # bumped on every change, used to key cached views
+        # id -> version of its last change, oldest change first, at most MAX_CHANGES
+        self.changed = OrderedDict() if shared else None
+        self.forgotten_version = 0  # newest version dropped from changed
+        self.journal = None  # optional TaskJournal that every change is appended to
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    # Bump the version, note which tasks it changed, and fold the journal into
+    # a snapshot once it has grown long enough
+    def _changed(self, task_ids):
+        self.version += 1
+        if self.changed is not None:
+            for task_id in task_ids:
+                self.changed[task_id] = self.version
+                self.changed.move_to_end(task_id)
+            while len(self.changed) > MAX_CHANGES:
+                self.forgotten_version = self.changed.popitem(last=False)[1]
+        if self.journal is not None and self.journal.needs_compaction():
+            self.journal.compact(self.tasks.values(), self.next_id)
+
+    # Optimistic concurrency: refuse a change based on an outdated copy of the task
+    def _check_version(self, task, expected_version):
+        if expected_version is not None and task.version != expected_version:
+            raise ConflictError(f"Task {task.id} was changed by someone else")
+
+    def _index(self, task):
+        self.by_status[task.completed].add(task.id)
+        self.by_priority[task.priority].add(task.id)
+        self.by_due_date.setdefault(task.due, set()).add(task.id)
+
+    def _unindex(self, task):
+        self.by_status[task.completed].discard(task.id)
+        self.by_priority[task.priority].discard(task.id)
+        ids = self.by_due_date.get(task.due)
+        if ids is not None:
+            ids.discard(task.id)
+            if not ids:
+                del self.by_due_date[task.due]
+
+    def get(self, task_id):
+        return self.tasks.get(task_id)
+
+    @_locked
+    def add(self, task):
+        task.id = self.next_id
+        task.version = self.version + 1
+        self.next_id += 1
+        self.tasks[task.id] = task
+        self._index(task)
+        if self.journal is not None:
+            self.journal.record_add([task])
+        self._changed([task.id])
+        return task
+
+    # Add a batch of tasks: ids are handed out as one block and the indexes
+    # are updated in a single pass at the end
+    @_locked
+    def add_many(self, tasks):
+        first_id = self.next_id
+        self.next_id += len(tasks)
+        for task_id, task in enumerate(tasks, first_id):
+            task.id = task_id
+            task.version = self.version + 1
+            self.tasks[task_id] = task
+        for task in tasks:
+            self._index(task)
+        if self.journal is not None:
+            self.journal.record_add(tasks)
+        self._changed([task.id for task in tasks])
+        return tasks
+
+    # Put back tasks that already have ids (loading a snapshot or journal)
+    @_locked
+    def restore(self, tasks, next_id=None):
+        self._put_back(tasks)
+        for task in tasks:
+            self.next_id = max(self.next_id, task.id + 1)
+        if next_id is not None:
+            self.next_id = max(self.next_id, next_id)
+        self.version += 1
+
+    # Put deleted tasks back under their old ids (undo of a delete)
+    @_locked
+    def undelete(self, tasks):
+        for task in tasks:
+            task.version = self.version + 1
+        self._put_back(tasks)
+        if self.journal is not None:
+            self.journal.record_add(tasks)
+        self._changed([task.id for task in tasks])
+        return tasks
+
+    # Old ids go back in id order, so "Created" order stays right. A task
+    # that is already there (replaying a journal) is replaced.
+    def _put_back(self, tasks):
+        last_id = next(reversed(self.tasks), 0)
+        tasks = sorted(tasks, key=lambda t: t.id)
+        for task in tasks:
+            old = self.tasks.get(task.id)
+            if old is not None:
+                self._unindex(old)
+            self.tasks[task.id] = task
+            self._index(task)
+        if tasks and tasks[0].id < last_id:
+            self.tasks = dict(sorted(self.tasks.items()))
+
+    # A copy of the task list, so other sessions can change the store meanwhile
+    @_locked
+    def iter_tasks(self):
+        return iter(list(self.tasks.values()))
+
+    # Tasks added or changed and ids deleted after the given store version,
+    # read back from the newest entry in changed until an older one comes up.
+    # An unshared store has only the one session, which made every change
+    # itself; a caller older than what changed still holds gets None for
+    # changed and deleted and has to compare every task instead.
+    @_locked
+    def changes_since(self, version):
+        if self.changed is None:
+            return [], [], self.version
+        if version < self.forgotten_version:
+            return None, None, self.version
+        changed = []
+        deleted = []
+        for task_id, changed_at in reversed(self.changed.items()):
+            if changed_at <= version:
+                break
+            task = self.tasks.get(task_id)
+            if task is None:
+                deleted.append(task_id)
+            else:
+                changed.append(task)
+        return changed, deleted, self.version
+
+    @_locked
+    def update(self, task_id, expected_version=None, **fields):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        self._check_version(task, expected_version)
+        self._unindex(task)
+        for name, value in fields.items():
+            setattr(task, name, value)
+        task.version = self.version + 1
+        self._index(task)
+        if self.journal is not None:
+            self.journal.record_update(task_id, fields)
+        self._changed([task_id])
+        return task
+
+    @_locked
+    def toggle(self, task_id, expected_version=None):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        self._check_version(task, expected_version)
+        self.by_status[task.completed].discard(task_id)
+        task.completed = not task.completed
+        task.version = self.version + 1
+        self.by_status[task.completed].add(task_id)
+        if self.journal is not None:
+            self.journal.record_toggle(task_id)
+        self._changed([task_id])
+        return task
+
+    @_locked
+    def delete(self, task_id, expected_version=None):
+        task = self.tasks.get(task_id)
+        if task is not None:
+            self._check_version(task, expected_version)
+            del self.tasks[task_id]
+            self._unindex(task)
+            task.version = self.version + 1  # the version of the delete, like the other changes
+            if self.journal is not None:
+                self.journal.record_delete(task_id)
+            self._changed([task_id])
+        return task
+
+    # changes maps task id -> fields to set on that task
+    @_locked
+    def update_many(self, changes):
+        updated = []
+        for task_id, fields in changes.items():
+            task = self.update(task_id, **fields)
+            if task is not None:
+                updated.append(task)
+        return updated
+
+    @_locked
+    def delete_many(self, task_ids):
+        return [task for task in map(self.delete, task_ids) if task is not None]
+
+    # Drop every completed task straight off the completed index
+    @_locked
+    def purge_completed(self):
+        return self.delete_many(list(self.by_status[True]))
+
+    # Ids matching the status/priority filters, or None when nothing is filtered.
+    # Passing ids (e.g. search hits) restricts the result to that set.
+    def matching_ids(self, status="All", priority="All", ids=None):
+        if ids is not None:
+            ids = ids & self.tasks.keys()
+        if status == "Pending":
+            ids = self.by_status[False] if ids is None else ids & self.by_status[False]
+        elif status == "Completed":
+            ids = self.by_status[True] if ids is None else ids & self.by_status[True]
+        if priority != "All":
+            level = self.by_priority[PRIORITY_RANK[priority]]
+            ids = level if ids is None else ids & level
+        return ids
+
+    @_locked
+    def count(self, status="All", priority="All", ids=None):
+        ids = self.matching_ids(status, priority, ids)
+        return len(self.tasks) if ids is None else len(ids)
+
+    # Filtered tasks in the requested order, read straight from the indexes
+    @_locked
+    def query(self, status="All", priority="All", sort_by="Created", limit=None, offset=0, ids=None):
+        if limit is not None and sort_by == "Created" and status == priority == "All" and ids is None:
+            # tasks is already in creation order, no need to copy all of it
+            return list(islice(self.tasks.values(), offset, offset + limit))
+        result = self._ordered(status, priority, sort_by, ids)
+        if limit is not None:
+            return result[offset:offset + limit]
+        return result
+
+    def _ordered(self, status, priority, sort_by, ids):
+        ids = self.matching_ids(status, priority, ids)
+        if sort_by == "Priority":
+            result = []
+            for level in self.by_priority:
+                group = level if ids is None else level & ids
+                result.extend(self.tasks[i] for i in sorted(group))
+            return result
+        if sort_by == "Due Date":
+            result = []
+            dates = sorted(d for d in self.by_due_date if d != NO_DUE_DATE)
+            if NO_DUE_DATE in self.by_due_date:
+                dates.append(NO_DUE_DATE)
+            for d in dates:
+                group = self.by_due_date[d] if ids is None else self.by_due_date[d] & ids
+                result.extend(self.tasks[i] for i in sorted(group))
+            return result
+        if ids is None:
+            return list(self.tasks.values())
+        return [self.tasks[i] for i in sorted(ids)]
+
+
+# Running statistics for the sidebar. Every TaskManager operation keeps these
+# up to date as it changes a task, so the sidebar never has to count over all tasks.
+class TaskStats:
+    def __init__(self, today=None):
+        self.today = today or date.today().toordinal()
+        self.total = 0
+        self.completed = 0
+        self.by_priority = [0] * len(PRIORITIES)  # indexed by priority rank
+        # id -> (completed, priority, version) as counted, so a task can be
+        # taken back out by id even when only its new state is known (changes
+        # made by another session on a shared store), and a change that has
+        # already been counted is recognised
+        self.tracked = {}
+        # Due dates of pending tasks, for the overdue count and the reminders panel
+        self.reminders = ReminderQueue(self.today)
+
+    @property
+    def pending(self):
+        return self.total - self.completed
+
+    @property
+    def overdue(self):
+        return len(self.reminders.overdue)
+
+    def track(self, task):
+        if task.id in self.tracked:
+            self.untrack_id(task.id)
+        self.tracked[task.id] = (task.completed, task.priority, task.version)
+        self.total += 1
+        self.completed += task.completed
+        self.by_priority[task.priority] += 1
+        if not task.completed and task.due:
+            self.reminders.push(task.id, task.due)
+
+    # Whether task is counted as it is now, at its current version
+    def is_current(self, task):
+        counted = self.tracked.get(task.id)
+        return counted is not None and counted[2] == task.version
+
+    def untrack(self, task):
+        self.untrack_id(task.id)
+
+    def untrack_id(self, task_id):
+        counted = self.tracked.pop(task_id, None)
+        if counted is None:
+            return
+        completed, priority, _ = counted
+        self.total -= 1
+        self.completed -= completed
+        self.by_priority[priority] -= 1
+        self.reminders.discard(task_id)
+
+    # Move tasks whose due date has passed into the overdue set
+    def refresh(self, today=None):
+        self.today = today or date.today().toordinal()
+        self.reminders.advance(self.today)
+
+    def snapshot(self):
+        return {
+            'total': self.total,
+            'completed': self.completed,
+            'pending': self.pending,
+            'overdue': self.overdue,
+            **dict(zip(PRIORITIES, self.by_priority))
+        }
+
+    @classmethod
+    def rebuild(cls, tasks, today=None):
+        stats = cls(today)
+        for task in tasks:
+            stats.track(task)
+        return stats
+
+    # Consistency check: recount everything from scratch and compare
+    def is_consistent(self, tasks):
+        self.refresh(self.today)
+        return TaskStats.rebuild(tasks, self.today).snapshot() == self.snapshot()
+
+
+# Set db_path to keep tasks in a SQLite file that every session (and app
+# replica) pointing at it shares, or journal_dir to keep an in-memory store
+# persisted through an append-only journal
+def open_store(db_path=None, journal_dir=None):
+    if db_path:
+        return SQLiteTaskStore(db_path)
+    task_store = TaskStore(shared=bool(journal_dir))
+    if journal_dir:
+        journal = TaskJournal(journal_dir)
+        journal.load(task_store)
+        task_store.journal = journal
+    return task_store
+
+
+# Every change goes through here so the store, stats, search index and undo
+# history never drift apart. expected_version is the task version the caller
+# was looking at; a change based on an older copy raises ConflictError.
+class TaskManager:
+    IMPORT_BATCH_SIZE = 5000
+
+    def __init__(self, store=None, undo_limit=UNDO_LIMIT_BYTES, today=None):
+        self.store = store if store is not None else TaskStore()
+        self.stats = TaskStats.rebuild(self.store.iter_tasks(), today)
+        self._search = None  # built on first use, see search
+        self.history = UndoHistory(undo_limit)
+        self.seen_version = self.store.version
+
+    # Kept in the stats, so this doesn't ask the store (COUNT(*) on SQLite)
+    def __len__(self):
+        return self.stats.total
+
+    # The search index is only built the first time it is needed, so a
+    # session that never searches never reads every task into it
+    @property
+    def search(self):
+        if self._search is None:
+            self._search = SearchIndex()
+            self._search.add_many(self.store.iter_tasks())
+        return self._search
+
+    # Keep the search index up to date, if it has been built yet
+    def _search_add_many(self, tasks):
+        if self._search is not None:
+            self._search.add_many(tasks)
+
+    def _search_update(self, task):
+        if self._search is not None:
+            self._search.update(task)
+
+    def _search_remove(self, task_id):
+        if self._search is not None:
+            self._search.remove(task_id)
+
+    # Pull in what other sessions changed in a shared store since we last
+    # looked, and move tasks that have become overdue. Our own changes only
+    # come back when another session wrote in between (see _caught_up), and
+    # are skipped: the stats already count them at that version.
+    def sync(self, today=None):
+        changed, deleted, version = self.store.changes_since(self.seen_version)
+        if changed is None:
+            # Too far behind for the store to list the changes: go through
+            # every task, and drop the tracked ones that are gone
+            changed = list(self.store.iter_tasks())
+            present = {task.id for task in changed}
+            deleted = [task_id for task_id in self.stats.tracked if task_id not in present]
+        for task in changed:
+            if self.stats.is_current(task):
+                continue
+            self.stats.track(task)
+            self._search_update(task)
+        for task_id in deleted:
+            self.stats.untrack_id(task_id)
+            self._search_remove(task_id)
+        self.seen_version = version
+        self.stats.refresh(today)
+
+    # After one of our own writes (tasks as the store returned them, stamped
+    # with the write's versions): if it came straight after the last version
+    # we have seen, nobody else wrote in between and there is nothing for
+    # sync() to fetch up to its end
+    def _caught_up(self, tasks):
+        versions = [task.version for task in tasks]
+        if versions and min(versions) == self.seen_version + 1:
+            self.seen_version = max(versions)
+
+    # ---------- Single-task operations ----------
+
+    def add(self, title, description='', priority=2, due=NO_DUE_DATE):
+        task = self.store.add(Task(title, description, priority, due))
+        self._caught_up([task])
+        self.stats.track(task)
+        self._search_update(task)
+        self.history.record([("add", task.copy())])
+        return task
+
+    # fields use the Task attribute names (priority is a rank, due an ordinal)
+    def update(self, task_id, expected_version=None, **fields):
+        before = self.store.get(task_id)
+        if before is None:
+            return None
+        before = before.copy()
+        task = self.store.update(task_id, expected_version, **fields)
+        if task is not None:
+            self._caught_up([task])
+            self.stats.track(task)
+            self._search_update(task)
+            old, new = field_changes(before, task, fields)
+            if new:
+                self.history.record([("update", task_id, old, new)])
+        return task
+
+    def toggle(self, task_id, expected_version=None):
+        task = self.store.toggle(task_id, expected_version)
+        if task is not None:
+            self._caught_up([task])
+            self.stats.track(task)
+            self.history.record([("update", task_id, {'completed': not task.completed},
+                                  {'completed': task.completed})])
+        return task
+
+    def delete(self, task_id, expected_version=None):
+        task = self.store.delete(task_id, expected_version)
+        if task is not None:
+            self._caught_up([task])
+            self.stats.untrack(task)
+            self._search_remove(task_id)
+            self.history.record([("delete", task)])
+        return task
+
+    # ---------- Batch operations ----------
+    # Each is one store call (one transaction on SQLite) and one undo step
+
+    # changes maps task id -> fields to set on that task
+    def update_many(self, changes):
+        before = {task.id: task.copy() for task in self.store.query(ids=set(changes))}
+        deltas = []
+        updated = self.store.update_many(changes)
+        self._caught_up(updated)
+        for task in updated:
+            self.stats.track(task)
+            old, new = field_changes(before[task.id], task, changes[task.id])
+            if new:
+                deltas.append(("update", task.id, old, new))
+                if 'title' in new or 'description' in new:
+                    self._search_update(task)
+        self.history.record(deltas)
+        return updated
+
+    def delete_many(self, task_ids):
+        return self._deleted(self.store.delete_many(task_ids))
+
+    def purge_completed(self):
+        return self._deleted(self.store.purge_completed())
+
+    def _deleted(self, tasks):
+        self._caught_up(tasks)
+        for task in tasks:
+            self.stats.untrack(task)
+            self._search_remove(task.id)
+        self.history.record([("delete", task) for task in tasks])
+        return tasks
+
+    def shift_due_dates(self, task_ids, days):
+        changes = {}
+        for task in self.store.query(ids=set(task_ids)):
+            if task.due:
+                changes[task.id] = {'due': task.due + days}
+        return self.update_many(changes)
+
+    # Stream validated tasks from a file into the store in batches, then bring
+    # the stats and search index up to date in one pass at the end. Imports are
+    # not undoable: keeping a copy of every imported task would double memory.
+    def import_tasks(self, fp, fmt, errors):
+        imported = []
+        for batch in task_io.batched(task_io.read_tasks(fp, fmt, errors), self.IMPORT_BATCH_SIZE):
+            added = self.store.add_many(batch)
+            self._caught_up(added)
+            imported.extend(added)
+        for task in imported:
+            self.stats.track(task)
+        self._search_add_many(imported)
+        return imported
+
+    # ---------- Undo / redo ----------
+
+    # Both return False when there is nothing to undo/redo. A step that no
+    # longer applies raises ConflictError and is dropped from the history.
+    def undo(self):
+        deltas = self.history.pop_undo()
+        if deltas is None:
+            return False
+        self._apply(invert(deltas))
+        self.history.done_undo(deltas)
+        return True
+
+    def redo(self):
+        deltas = self.history.pop_redo()
+        if deltas is None:
+            return False
+        self._apply(deltas)
+        self.history.done_redo(deltas)
+        return True
+
+    # Apply a recorded step to the store. Every delta is checked against the
+    # current tasks first, so a step whose tasks were changed since (by another
+    # session) is refused as a whole rather than half applied.
+    def _apply(self, deltas):
+        changes, removed, restored = {}, [], []
+        for delta in deltas:
+            task = self.store.get(delta[1].id if delta[0] != "update" else delta[1])
+            if delta[0] == "update":
+                _, task_id, before, after = delta
+                if task is None or any(getattr(task, name) != value for name, value in before.items()):
+                    raise ConflictError(f"Task {task_id} was changed by someone else")
+                changes[task_id] = after
+            elif delta[0] == "delete":
+                if task != delta[1]:
+                    raise ConflictError(f"Task {delta[1].id} was changed by someone else")
+                removed.append(task.id)
+            else:
+                if task is not None:
+                    raise ConflictError(f"Task {delta[1].id} already exists")
+                restored.append(delta[1].copy())
+        if changes:
+            updated = self.store.update_many(changes)
+            self._caught_up(updated)
+            for task in updated:
+                self.stats.track(task)
+                self._search_update(task)
+        if removed:
+            deleted = self.store.delete_many(removed)
+            self._caught_up(deleted)
+            for task in deleted:
+                self.stats.untrack(task)
+                self._search_remove(task.id)
+        if restored:
+            restored = self.store.undelete(restored)
+            self._caught_up(restored)
+            for task in restored:
+                self.stats.track(task)
+                self._search_update(task)
+
+    # ---------- Queries ----------
+
+    def get(self, task_id):
+        return self.store.get(task_id)
+
+    # Ids of tasks matching a search box query, or None for an empty query
+    def search_ids(self, text):
+        return self.search.search(text) if text.strip() else None
+
+    def count(self, status="All", priority="All", ids=None):
+        return self.store.count(status, priority, ids=ids)
+
+    def query(self, status="All", priority="All", sort_by="Created", limit=None, offset=0, ids=None):
+        return self.store.query(status, priority, sort_by, limit, offset, ids)
+
+    # Type-ahead lookup for the edit picker. "#12" (or "12") also offers task
+    # 12 itself, and an empty query lists the oldest tasks.
+    def find(self, text, limit):
+        text = text.strip()
+        if not text:
+            return self.store.query(limit=limit)
+        ids = self.search.complete(text, limit)
+        if text.lstrip("#").isdigit():
+            task_id = int(text.lstrip("#"))
+            if task_id not in ids and self.store.get(task_id) is not None:
+                ids = [task_id] + ids[:limit - 1]
+        return [task for task in map(self.store.get, ids) if task is not None]
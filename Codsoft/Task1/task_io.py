@@ -0,0 +1,218 @@
+import csv
+import json
+from itertools import islice
+
+from task_record import PRIORITY_RANK, Task, parse_created, to_ordinal
+
+# Bulk import/export of tasks as NDJSON, JSON or CSV.
+# Everything here works on generators so a large file is never held as one
+# parsed document or one big string.
+
+FORMATS = ["NDJSON", "JSON", "CSV"]
+FIELDS = ['id', 'title', 'description', 'priority', 'due_date', 'completed', 'created_at']
+TRUE_VALUES = {'true', '1', 'yes', 'y'}
+FALSE_VALUES = {'false', '0', 'no', 'n', ''}
+CHUNK_SIZE = 64 * 1024
+MAX_ERRORS = 100
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------- Reading ----------
+
+# A line that isn't valid JSON is yielded as its ValueError so the caller can
+# report it and carry on with the next line
+def iter_ndjson(fp):
+    for line in fp:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+# Decode the items of a top-level JSON array one at a time, reading the file
+# in chunks instead of json.load()-ing the whole document
+def iter_json(fp, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    expect_item = True  # False right after an item: only "," or "]" may follow
+    empty = True  # no items yet, so "]" may come straight after "["
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("JSON import expects a top-level array of tasks")
+                started = True
+                pos += 1
+                continue
+            if not expect_item:
+                if buffer[pos] == "]":
+                    return
+                if buffer[pos] != ",":
+                    raise ValueError("Expected ',' or ']' after a task in the JSON array")
+                expect_item = True
+                pos += 1
+                continue
+            if buffer[pos] == "]" and empty:
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Don't trust a value that runs right up to the end of the buffer
+                # unless the file is done, it may be cut off mid-number
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    expect_item = False
+                    empty = False
+                    continue
+        if eof:
+            raise ValueError("Unexpected end of JSON input")
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_csv(fp):
+    for row in csv.DictReader(fp):
+        yield row
+
+
+READERS = {"NDJSON": iter_ndjson, "JSON": iter_json, "CSV": iter_csv}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"invalid completed value {value!r}")
+
+
+# Check one imported record and turn it into a Task (without an id)
+def validate_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("record is not an object")
+    title = row.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title is required")
+    description = row.get('description') or ''
+    if not isinstance(description, str):
+        raise ValueError("description must be text")
+    priority = row.get('priority') or 'Low'
+    if not isinstance(priority, str) or priority not in PRIORITY_RANK:
+        raise ValueError(f"invalid priority {priority!r}")
+    due_date = row.get('due_date') or None
+    try:
+        due = to_ordinal(due_date)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"invalid due date {due_date!r}")
+    created_at = row.get('created_at') or None
+    created = None
+    if created_at is not None:
+        try:
+            created = parse_created(created_at)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid created_at {created_at!r}")
+    return Task(title, description, PRIORITY_RANK[priority], due,
+                _parse_bool(row.get('completed', False)), created)
+
+
+# Stream validated tasks out of a text file. Bad records are skipped and
+# reported in errors as (record number, message); only the first MAX_ERRORS
+# messages are kept.
+def read_tasks(fp, fmt, errors):
+    records = READERS[fmt](fp)
+    number = 0
+    while True:
+        number += 1
+        try:
+            row = next(records)
+        except StopIteration:
+            return
+        except (ValueError, csv.Error) as e:
+            # JSON and CSV can't carry on after a parse error
+            _add_error(errors, number, str(e))
+            return
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            yield validate_row(row)
+        except ValueError as e:
+            _add_error(errors, number, str(e))
+
+
+def _add_error(errors, number, message):
+    if len(errors) < MAX_ERRORS:
+        errors.append((number, message))
+
+
+# ---------- Writing ----------
+
+def iter_ndjson_lines(tasks):
+    for task in tasks:
+        yield json.dumps(task.to_dict(), ensure_ascii=False) + "\n"
+
+
+def iter_json_chunks(tasks):
+    yield "["
+    first = True
+    for task in tasks:
+        yield ("\n  " if first else ",\n  ") + json.dumps(task.to_dict(), ensure_ascii=False)
+        first = False
+    yield "\n]\n"
+
+
+def iter_csv_lines(tasks):
+    # csv.writer needs a file, so write each row into a tiny reusable buffer
+    line = _LineBuffer()
+    writer = csv.DictWriter(line, fieldnames=FIELDS)
+    writer.writeheader()
+    yield line.pop()
+    for task in tasks:
+        writer.writerow(task.to_dict())
+        yield line.pop()
+
+
+class _LineBuffer:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def pop(self):
+        text = "".join(self.parts)
+        self.parts.clear()
+        return text
+
+
+WRITERS = {"NDJSON": iter_ndjson_lines, "JSON": iter_json_chunks, "CSV": iter_csv_lines}
+EXTENSIONS = {"NDJSON": "ndjson", "JSON": "json", "CSV": "csv"}
+MIME_TYPES = {"NDJSON": "application/x-ndjson", "JSON": "application/json", "CSV": "text/csv"}
+
+
+def write_tasks(tasks, fp, fmt):
+    for piece in WRITERS[fmt](tasks):
+        fp.write(piece)
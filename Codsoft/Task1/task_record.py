@@ -0,0 +1,90 @@
+import time
+from datetime import date, datetime
+
+# Compact task record. Priority is a small int (0 = High, 1 = Medium, 2 = Low,
+# so it also sorts the way the app shows it), the due date is a date ordinal
+# (0 = no due date) and created is epoch seconds. Strings are only built when
+# a task is rendered or exported. version is the store version at the task's
+# last change and is what optimistic concurrency checks compare against.
+
+PRIORITIES = ('High', 'Medium', 'Low')
+PRIORITY_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+NO_DUE_DATE = 0
+
+
+# Raised when a change was based on an outdated version of a task
+class ConflictError(Exception):
+    pass
+
+
+def to_ordinal(value):
+    if not value:
+        return NO_DUE_DATE
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+def format_due(due):
+    return date.fromordinal(due).strftime('%Y-%m-%d') if due else None
+
+
+def format_created(created):
+    return datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_created(text):
+    return int(datetime.strptime(text, '%Y-%m-%d %H:%M:%S').timestamp())
+
+
+class Task:
+    __slots__ = ('id', 'title', 'description', 'priority', 'due', 'completed', 'created', 'version')
+
+    def __init__(self, title, description='', priority=2, due=NO_DUE_DATE, completed=False,
+                 created=None, id=0, version=0):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.due = due
+        self.completed = completed
+        self.created = int(time.time()) if created is None else created
+        self.version = version
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, title={self.title!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        # version is bookkeeping, not content, so it is left out
+        return all(getattr(self, name) == getattr(other, name) for name in Task.__slots__[:-1])
+
+    def copy(self):
+        return Task(self.title, self.description, self.priority, self.due, self.completed,
+                    self.created, self.id, self.version)
+
+    # Render-time views of the encoded fields
+    @property
+    def priority_name(self):
+        return PRIORITIES[self.priority]
+
+    @property
+    def due_date(self):
+        return format_due(self.due)
+
+    @property
+    def created_at(self):
+        return format_created(self.created)
+
+    # Plain dict in the app's original string format, used for export
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority_name,
+            'due_date': self.due_date,
+            'completed': self.completed,
+            'created_at': self.created_at
+        }
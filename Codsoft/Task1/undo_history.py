@@ -0,0 +1,111 @@
+from collections import deque
+
+# Undo/redo history made of field-level deltas instead of copies of the list.
+# A step is a list of deltas, one per task it touched:
+#   ("add", task)                        the task as it was added
+#   ("delete", task)                     the task as it was when deleted
+#   ("update", task_id, before, after)   only the fields that changed
+# A batch action records all of its deltas as one step, so it undoes as one.
+# The steps are kept under a rough byte budget; once it is exceeded the
+# oldest steps are dropped first.
+
+UNDO_LIMIT_BYTES = 1024 * 1024
+DELTA_OVERHEAD = 100  # rough cost of the tuple/dict around each delta
+TASK_OVERHEAD = 150  # rough cost of a Task record without its strings
+
+
+def _value_size(value):
+    return len(value) if isinstance(value, str) else 8
+
+
+def delta_size(delta):
+    if delta[0] == "update":
+        fields = list(delta[2].values()) + list(delta[3].values())
+        return DELTA_OVERHEAD + sum(_value_size(value) for value in fields)
+    task = delta[1]
+    return DELTA_OVERHEAD + TASK_OVERHEAD + len(task.title) + len(task.description)
+
+
+# The fields of after that differ from before, as (before, after) dicts
+def field_changes(before, after, names):
+    old, new = {}, {}
+    for name in names:
+        if getattr(before, name) != getattr(after, name):
+            old[name] = getattr(before, name)
+            new[name] = getattr(after, name)
+    return old, new
+
+
+# Swap a step around so applying it undoes the original
+def invert(deltas):
+    inverted = []
+    for delta in reversed(deltas):
+        if delta[0] == "update":
+            inverted.append(("update", delta[1], delta[3], delta[2]))
+        else:
+            inverted.append(("delete" if delta[0] == "add" else "add", delta[1]))
+    return inverted
+
+
+class UndoHistory:
+    def __init__(self, max_bytes=UNDO_LIMIT_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_steps = deque()  # (deltas, size), newest on the right
+        self.redo_steps = []
+        self.size = 0  # bytes used by both stacks
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    # A new change: it becomes the step to undo and the redo stack is cleared
+    def record(self, deltas):
+        if not deltas:
+            return
+        for _, size in self.redo_steps:
+            self.size -= size
+        self.redo_steps.clear()
+        self._push_undo(deltas)
+
+    def _push_undo(self, deltas):
+        size = sum(map(delta_size, deltas))
+        if size > self.max_bytes:
+            # Too big to keep, and the older steps can't be reached past it
+            self.clear()
+            return
+        self.undo_steps.append((deltas, size))
+        self.size += size
+        while self.size > self.max_bytes:
+            _, dropped = self.undo_steps.popleft()
+            self.size -= dropped
+
+    # Take the next step to undo (or redo). The caller applies it and hands it
+    # back with done_undo()/done_redo(), or drops it if it could not be applied.
+    def pop_undo(self):
+        if not self.undo_steps:
+            return None
+        deltas, size = self.undo_steps.pop()
+        self.size -= size
+        return deltas
+
+    def pop_redo(self):
+        if not self.redo_steps:
+            return None
+        deltas, size = self.redo_steps.pop()
+        self.size -= size
+        return deltas
+
+    def done_undo(self, deltas):
+        size = sum(map(delta_size, deltas))
+        self.redo_steps.append((deltas, size))
+        self.size += size
+
+    def done_redo(self, deltas):
+        self._push_undo(deltas)
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.size = 0
@@ -1,229 +1,322 @@
-import tkinter as tk
-from tkinter import messagebox
-
-# Let's create our main calculator window
-window = tk.Tk()
-window.title("Simple Calculator")
-window.geometry("400x500")
-window.resizable(False, False)
-window.configure(bg="#2c3e50")
-
-# Variables to store our numbers and operation
-first_number = None
-operation = None
-clear_on_next = False
-
-# This will be our display screen
-display = tk.Entry(
-    window,
-    font=("Arial", 24),
-    justify="right",
-    bg="#ecf0f1",
-    fg="#2c3e50",
-    borderwidth=5,
-    relief="ridge"
-)
-display.grid(row=0, column=0, columnspan=4, padx=10, pady=20, sticky="ew")
-display.insert(0, "0")
+import os
+import sys
+
+from calculator_core import CalculatorCore, error_message
+from functions import is_definition
+from history import History
+from number_backends import DEFAULT_PRECISION
+
+# Tk front end for the calculator. All the calculator logic is in
+# calculator_core.CalculatorCore; the functions here only copy the display to
+# the core, call it, and copy the result back. tkinter is imported when the
+# window is built, not at import time, and
+#
+#   python Calculator.py "2+3*4"
+#
+# hands over to calculator_cli.py without loading Tk at all.
+#
+# Set CALC_HISTORY_PATH to keep the history tape in that file between runs.
+
+# Filled in by build_window()
+tk = None
+messagebox = None
+window = None
+display = None
+mode_var = None
+precision_var = None
+history_window = None
+refresh_history = None
+
+core = CalculatorCore()
+
+# Number mode: Float is fastest, Decimal keeps the chosen number of
+# significant digits, Fraction is exact (1/3 stays 1/3)
+MODES = {"Float": "float", "Decimal": "decimal", "Fraction": "fraction"}
+
+# Run a core action on what the display shows right now (it can also be typed
+# into) and show the new text
+def run(action, *args):
+    core.text = display.get()
+    try:
+        return action(*args)
+    finally:
+        display.delete(0, tk.END)
+        display.insert(0, core.text)
 
 # Function to handle number button clicks
 def button_click(number):
-    global clear_on_next
-    
-    current = display.get()
-    
-    # If we just calculated something, clear the display for new input
-    if clear_on_next:
-        display.delete(0, tk.END)
-        clear_on_next = False
-        current = ""
-    
-    # If display shows "0", replace it. Otherwise, append
-    if current == "0":
-        display.delete(0, tk.END)
-        display.insert(0, str(number))
-    else:
-        display.insert(tk.END, str(number))
+    run(core.press_digit, number)
 
 # Function to clear everything
 def clear():
-    global first_number, operation, clear_on_next
-    display.delete(0, tk.END)
-    display.insert(0, "0")
-    first_number = None
-    operation = None
-    clear_on_next = False
-
-# Function to handle operations (+, -, *, /)
+    run(core.clear)
+
+# Function to remove the last character
+def backspace():
+    run(core.backspace)
+
+# Function to add an operator or bracket to the expression
 def set_operation(op):
-    global first_number, operation, clear_on_next
-    
+    run(core.set_operation, op)
+
+# Function to handle decimal point (only one per number)
+def add_decimal():
+    run(core.add_decimal)
+
+# Function to calculate the result, or store a definition typed in (e.g.
+# tax(x)=x*1.2) for later calculations
+def calculate(event=None):
+    core.mode, core.precision = current_mode()
+    defining = is_definition(display.get())
     try:
-        # Store the first number
-        first_number = float(display.get())
-        operation = op
-        clear_on_next = True
-    except ValueError:
-        messagebox.showerror("Error", "Please enter a valid number!")
-
-# Function to calculate the result
-def calculate():
-    global first_number, operation, clear_on_next
-    
-    # Make sure we have everything we need
-    if first_number is None or operation is None:
+        text = run(core.calculate)
+    except (ArithmeticError, ValueError) as e:
+        messagebox.showerror("Error", error_message(e))
         return
-    
+    if defining:
+        messagebox.showinfo("Defined", text)
+    if refresh_history is not None:
+        refresh_history()
+
+def current_mode():
     try:
-        # Get the second number
-        second_number = float(display.get())
-        result = None
-        
-        # Do the math based on the operation
-        if operation == "+":
-            result = first_number + second_number
-        elif operation == "-":
-            result = first_number - second_number
-        elif operation == "*":
-            result = first_number * second_number
-        elif operation == "/":
-            # Watch out for division by zero!
-            if second_number == 0:
-                messagebox.showerror("Error", "Cannot divide by zero!")
-                clear()
-                return
-            result = first_number / second_number
-        
-        # Show the result
-        display.delete(0, tk.END)
-        
-        # Format the result nicely (remove .0 if it's a whole number)
-        if result == int(result):
-            display.insert(0, str(int(result)))
-        else:
-            display.insert(0, str(round(result, 8)))
-        
-        # Reset for next calculation
-        first_number = None
-        operation = None
-        clear_on_next = True
-        
+        precision = max(1, int(precision_var.get()))
     except ValueError:
-        messagebox.showerror("Error", "Please enter a valid number!")
+        precision = DEFAULT_PRECISION
+    return MODES[mode_var.get()], precision
 
-# Function to handle decimal point
-def add_decimal():
-    current = display.get()
-    if "." not in current:
-        display.insert(tk.END, ".")
-
-# Now let's create all the buttons
-# Button styling
-button_config = {
-    "font": ("Arial", 16, "bold"),
-    "width": 5,
-    "height": 2,
-    "borderwidth": 3,
-    "relief": "raised"
-}
-
-number_color = "#3498db"  # Blue for numbers
-operation_color = "#e74c3c"  # Red for operations
-special_color = "#95a5a6"  # Gray for special buttons
-
-# Row 1: Clear and operations
-tk.Button(
-    window, text="C", command=clear,
-    bg=special_color, fg="white", **button_config
-).grid(row=1, column=0, padx=5, pady=5)
-
-tk.Button(
-    window, text="/", command=lambda: set_operation("/"),
-    bg=operation_color, fg="white", **button_config
-).grid(row=1, column=1, padx=5, pady=5)
-
-tk.Button(
-    window, text="*", command=lambda: set_operation("*"),
-    bg=operation_color, fg="white", **button_config
-).grid(row=1, column=2, padx=5, pady=5)
-
-tk.Button(
-    window, text="-", command=lambda: set_operation("-"),
-    bg=operation_color, fg="white", **button_config
-).grid(row=1, column=3, padx=5, pady=5)
-
-# Row 2: 7, 8, 9
-tk.Button(
-    window, text="7", command=lambda: button_click(7),
-    bg=number_color, fg="white", **button_config
-).grid(row=2, column=0, padx=5, pady=5)
-
-tk.Button(
-    window, text="8", command=lambda: button_click(8),
-    bg=number_color, fg="white", **button_config
-).grid(row=2, column=1, padx=5, pady=5)
-
-tk.Button(
-    window, text="9", command=lambda: button_click(9),
-    bg=number_color, fg="white", **button_config
-).grid(row=2, column=2, padx=5, pady=5)
-
-tk.Button(
-    window, text="+", command=lambda: set_operation("+"),
-    bg=operation_color, fg="white", **button_config
-).grid(row=2, column=3, padx=5, pady=5)
-
-# Row 3: 4, 5, 6
-tk.Button(
-    window, text="4", command=lambda: button_click(4),
-    bg=number_color, fg="white", **button_config
-).grid(row=3, column=0, padx=5, pady=5)
-
-tk.Button(
-    window, text="5", command=lambda: button_click(5),
-    bg=number_color, fg="white", **button_config
-).grid(row=3, column=1, padx=5, pady=5)
-
-tk.Button(
-    window, text="6", command=lambda: button_click(6),
-    bg=number_color, fg="white", **button_config
-).grid(row=3, column=2, padx=5, pady=5)
-
-# Row 4: 1, 2, 3
-tk.Button(
-    window, text="1", command=lambda: button_click(1),
-    bg=number_color, fg="white", **button_config
-).grid(row=4, column=0, padx=5, pady=5)
-
-tk.Button(
-    window, text="2", command=lambda: button_click(2),
-    bg=number_color, fg="white", **button_config
-).grid(row=4, column=1, padx=5, pady=5)
-
-tk.Button(
-    window, text="3", command=lambda: button_click(3),
-    bg=number_color, fg="white", **button_config
-).grid(row=4, column=2, padx=5, pady=5)
-
-# Row 5: 0, decimal, equals
-tk.Button(
-    window, text="0", command=lambda: button_click(0),
-    bg=number_color, fg="white", **button_config
-).grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
-
-tk.Button(
-    window, text=".", command=add_decimal,
-    bg=special_color, fg="white", **button_config
-).grid(row=5, column=2, padx=5, pady=5)
-
-tk.Button(
-    window, text="=", command=calculate,
-    bg="#27ae60", fg="white", **button_config  # Green for equals
-).grid(row=4, column=3, rowspan=2, padx=5, pady=5, sticky="ns")
-
-# Configure grid weights so buttons expand properly
-for i in range(4):
-    window.grid_columnconfigure(i, weight=1)
-
-# Start the main event loop
-window.mainloop()
+# History window: the latest results, or the ones whose expression contains
+# what is typed in the search box. Double-click (or Enter) puts a result back
+# on the display without working it out again.
+HISTORY_ROWS = 50
+
+def show_history():
+    global history_window, refresh_history
+    if history_window is not None and history_window.winfo_exists():
+        history_window.lift()
+        return
+    history_window = tk.Toplevel(window)
+    history_window.title("History")
+    search = tk.Entry(history_window, font=("Arial", 12))
+    search.pack(fill="x", padx=5, pady=5)
+    listbox = tk.Listbox(history_window, font=("Arial", 12), width=40, height=15)
+    listbox.pack(fill="both", expand=True, padx=5, pady=5)
+    shown = []
+
+    def refresh(event=None):
+        text = search.get().strip()
+        shown[:] = core.history.search(text, HISTORY_ROWS) if text else core.history.last(HISTORY_ROWS)
+        listbox.delete(0, tk.END)
+        for entry in shown:
+            listbox.insert(tk.END, f"{entry.expression} = {entry.result}")
+
+    def use(event=None):
+        selection = listbox.curselection()
+        if selection:
+            run(core.recall, shown[selection[0]].result)
+
+    search.bind("<KeyRelease>", refresh)
+    listbox.bind("<Double-Button-1>", use)
+    listbox.bind("<Return>", use)
+    refresh_history = refresh
+    refresh()
+
+def build_window():
+    global tk, messagebox, window, display, mode_var, precision_var
+    import tkinter as tk
+    from tkinter import messagebox
+
+    core.history = History(os.environ.get("CALC_HISTORY_PATH"))
+
+    # Let's create our main calculator window
+    window = tk.Tk()
+    window.title("Simple Calculator")
+    window.geometry("400x700")
+    window.resizable(False, False)
+    window.configure(bg="#2c3e50")
+
+    # This will be our display screen
+    display = tk.Entry(
+        window,
+        font=("Arial", 24),
+        justify="right",
+        bg="#ecf0f1",
+        fg="#2c3e50",
+        borderwidth=5,
+        relief="ridge"
+    )
+    display.grid(row=0, column=0, columnspan=4, padx=10, pady=20, sticky="ew")
+    display.insert(0, core.text)
+
+    # Now let's create all the buttons
+    # Button styling
+    button_config = {
+        "font": ("Arial", 16, "bold"),
+        "width": 5,
+        "height": 2,
+        "borderwidth": 3,
+        "relief": "raised"
+    }
+
+    number_color = "#3498db"  # Blue for numbers
+    operation_color = "#e74c3c"  # Red for operations
+    special_color = "#95a5a6"  # Gray for special buttons
+
+    # Row 1: Clear and operations
+    tk.Button(
+        window, text="C", command=clear,
+        bg=special_color, fg="white", **button_config
+    ).grid(row=1, column=0, padx=5, pady=5)
+
+    tk.Button(
+        window, text="/", command=lambda: set_operation("/"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=1, column=1, padx=5, pady=5)
+
+    tk.Button(
+        window, text="*", command=lambda: set_operation("*"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=1, column=2, padx=5, pady=5)
+
+    tk.Button(
+        window, text="-", command=lambda: set_operation("-"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=1, column=3, padx=5, pady=5)
+
+    # Row 2: 7, 8, 9
+    tk.Button(
+        window, text="7", command=lambda: button_click(7),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=2, column=0, padx=5, pady=5)
+
+    tk.Button(
+        window, text="8", command=lambda: button_click(8),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=2, column=1, padx=5, pady=5)
+
+    tk.Button(
+        window, text="9", command=lambda: button_click(9),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=2, column=2, padx=5, pady=5)
+
+    tk.Button(
+        window, text="+", command=lambda: set_operation("+"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=2, column=3, padx=5, pady=5)
+
+    # Row 3: 4, 5, 6
+    tk.Button(
+        window, text="4", command=lambda: button_click(4),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=3, column=0, padx=5, pady=5)
+
+    tk.Button(
+        window, text="5", command=lambda: button_click(5),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=3, column=1, padx=5, pady=5)
+
+    tk.Button(
+        window, text="6", command=lambda: button_click(6),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=3, column=2, padx=5, pady=5)
+
+    # Row 4: 1, 2, 3
+    tk.Button(
+        window, text="1", command=lambda: button_click(1),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=4, column=0, padx=5, pady=5)
+
+    tk.Button(
+        window, text="2", command=lambda: button_click(2),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=4, column=1, padx=5, pady=5)
+
+    tk.Button(
+        window, text="3", command=lambda: button_click(3),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=4, column=2, padx=5, pady=5)
+
+    # Row 5: 0, decimal, equals
+    tk.Button(
+        window, text="0", command=lambda: button_click(0),
+        bg=number_color, fg="white", **button_config
+    ).grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+
+    tk.Button(
+        window, text=".", command=add_decimal,
+        bg=special_color, fg="white", **button_config
+    ).grid(row=5, column=2, padx=5, pady=5)
+
+    tk.Button(
+        window, text="=", command=calculate,
+        bg="#27ae60", fg="white", **button_config  # Green for equals
+    ).grid(row=4, column=3, rowspan=2, padx=5, pady=5, sticky="ns")
+
+    tk.Button(
+        window, text="^", command=lambda: set_operation("^"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=3, column=3, padx=5, pady=5)
+
+    # Row 6: brackets, remainder and backspace
+    tk.Button(
+        window, text="(", command=lambda: set_operation("("),
+        bg=special_color, fg="white", **button_config
+    ).grid(row=6, column=0, padx=5, pady=5)
+
+    tk.Button(
+        window, text=")", command=lambda: set_operation(")"),
+        bg=special_color, fg="white", **button_config
+    ).grid(row=6, column=1, padx=5, pady=5)
+
+    tk.Button(
+        window, text="%", command=lambda: set_operation("%"),
+        bg=operation_color, fg="white", **button_config
+    ).grid(row=6, column=2, padx=5, pady=5)
+
+    tk.Button(
+        window, text="⌫", command=backspace,
+        bg=special_color, fg="white", **button_config
+    ).grid(row=6, column=3, padx=5, pady=5)
+
+    # Row 7: number mode and Decimal precision
+    mode_var = tk.StringVar(value="Float")
+    precision_var = tk.StringVar(value=str(DEFAULT_PRECISION))
+
+    tk.Label(window, text="Mode", bg="#2c3e50", fg="white", font=("Arial", 12)).grid(row=7, column=0, pady=10)
+    mode_menu = tk.OptionMenu(window, mode_var, *MODES)
+    mode_menu.config(font=("Arial", 12), width=7)
+    mode_menu.grid(row=7, column=1, pady=10)
+    tk.Label(window, text="Digits", bg="#2c3e50", fg="white", font=("Arial", 12)).grid(row=7, column=2, pady=10)
+    tk.Spinbox(window, from_=1, to=1000, textvariable=precision_var, width=5,
+               font=("Arial", 12)).grid(row=7, column=3, pady=10)
+
+    # Row 8: history tape
+    tk.Button(
+        window, text="History", command=show_history,
+        bg=special_color, fg="white", font=("Arial", 12, "bold"), borderwidth=3, relief="raised"
+    ).grid(row=8, column=0, columnspan=4, padx=5, pady=5, sticky="ew")
+
+    # Keyboard: type the expression straight into the display
+    display.bind("<Return>", calculate)
+    display.bind("<KP_Enter>", calculate)
+    display.bind("<Escape>", lambda event: clear())
+
+    # Configure grid weights so buttons expand properly
+    for i in range(4):
+        window.grid_columnconfigure(i, weight=1)
+
+
+def main():
+    if len(sys.argv) > 1:
+        # An expression or option on the command line: no window needed
+        from calculator_cli import main as cli_main
+        cli_main()
+        return
+    build_window()
+    # Start the main event loop
+    window.mainloop()
+    core.history.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
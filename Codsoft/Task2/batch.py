@@ -0,0 +1,295 @@
+import argparse
+import csv
+import re
+import sys
+from itertools import islice
+
+from expression import Call, ExpressionError, Variable, compile_expression, evaluate, variable_names
+from number_backends import DEFAULT_PRECISION, FLOAT, format_number, get_backend
+
+try:
+    import numpy
+except ImportError:  # the chunked pure-Python path gives the same results, just slower
+    numpy = None
+
+# Batch mode: one expression over whole columns of data, no window needed.
+#
+#   python batch.py "price*qty" orders.csv                  # CSV to stdout
+#   python batch.py "price*qty" orders.csv -o out.csv --column total
+#   python batch.py "a/b" data.csv --mode decimal --precision 50
+#   cat data.csv | python batch.py "x^2+1" -
+#
+# Variables in the expression are CSV columns (by header name). The file is
+# read CHUNK_ROWS rows at a time and every chunk is written out before the
+# next is read, so files bigger than memory are fine.
+#
+# In float mode with NumPy installed a chunk is evaluated as whole columns
+# (one NumPy operation per operator in the compiled program). NumPy works in
+# float64, so whole numbers beyond 2^53 are rounded; --no-numpy, or the
+# Decimal/Fraction modes, keep them exact. Without NumPy, or in the other
+# modes, each row goes through evaluate() like a calculation typed on the
+# keypad.
+#
+# Errors are the same as calculate(): division by zero raises
+# ZeroDivisionError, results that are not real numbers raise ValueError and
+# so on, with the row number (1 = first row after the header) in the message.
+# The rows before the bad one have already been written by then: a chunk that
+# fails is worked out again up to the bad row and that part is written first.
+
+CHUNK_ROWS = 10_000
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+WHOLE_NUMBER = re.compile(r"[-+]?\d+")
+
+
+# error with "row N: " in front, and the row number kept as error.row
+def _row_error(error, row):
+    message = f"row {row}: {error}"
+    try:
+        error = error.__class__(message)
+    except TypeError:
+        error = ValueError(message)
+    error.row = row
+    return error
+
+
+# ---------- Reading values ----------
+
+def _number(text, backend):
+    text = text.strip()
+    if WHOLE_NUMBER.fullmatch(text):
+        return int(text)
+    if NUMBER.fullmatch(text):
+        return backend.number(text)
+    raise ValueError(f"{text!r} is not a number")
+
+
+# name -> column index in header, for the variables the program uses
+def _column_indexes(program, header):
+    positions = {name: i for i, name in enumerate(header)}
+    indexes = {}
+    for name in variable_names(program):
+        if name not in positions:
+            raise ExpressionError(f"Unknown variable {name!r}, the columns are: {', '.join(header)}")
+        indexes[name] = positions[name]
+    return indexes
+
+
+# One column of a chunk of CSV rows, as numbers of the backend
+def _read_column(rows, index, name, backend, first_row):
+    values = []
+    for row_number, row in enumerate(rows, first_row):
+        try:
+            values.append(_number(row[index], backend))
+        except IndexError:
+            raise _row_error(ValueError(f"no value for {name!r}"), row_number)
+        except ValueError as error:
+            raise _row_error(ValueError(f"{name}: {error}"), row_number)
+    return values
+
+
+def _read_array(rows, index, name, first_row):
+    try:
+        array = numpy.array([row[index] for row in rows], dtype=numpy.float64)
+    except (IndexError, ValueError):
+        array = None
+    if array is None or not numpy.isfinite(array).all():
+        # Let the pure-Python reader find the bad row and say what's wrong
+        return numpy.array(_read_column(rows, index, name, FLOAT, first_row), dtype=numpy.float64)
+    return array
+
+
+# ---------- Evaluating ----------
+
+if numpy is not None:
+    NUMPY_OPERATIONS = {'+': numpy.add, '-': numpy.subtract, '*': numpy.multiply,
+                        '/': numpy.true_divide, '%': numpy.mod, '^': numpy.power}
+
+
+def _check_rows(bad, first_row, error_class, message):
+    if numpy.any(bad):
+        row = first_row + (int(numpy.argmax(bad)) if numpy.ndim(bad) else 0)
+        raise _row_error(error_class(message), row)
+
+
+# The same stack machine as evaluate(), with float64 columns on the stack.
+# NumPy would quietly give inf or nan where the float mode raises, so / % and
+# ^ check their operands and results first.
+def _evaluate_vectorized(program, columns, size, first_row):
+    stack = []
+    push = stack.append
+    with numpy.errstate(all="ignore"):
+        for item in program:
+            if item.__class__ is str:
+                if item == "neg":
+                    stack[-1] = numpy.negative(stack[-1])
+                    continue
+                right = stack.pop()
+                left = stack[-1]
+                if item == "/" or item == "%":
+                    _check_rows(right == 0, first_row, ZeroDivisionError, "division by zero")
+                result = NUMPY_OPERATIONS[item](left, right)
+                if item == "^":
+                    _check_rows(numpy.isnan(result) | ((left == 0) & (right < 0)), first_row,
+                                ValueError, "The result is not a real number")
+                    _check_rows(numpy.isinf(result), first_row, OverflowError, "Result is too big")
+                stack[-1] = result
+            elif item.__class__ is Variable:
+                push(columns[item.name])
+            elif item.__class__ is Call:
+                raise ExpressionError(f"Unknown function {item.name!r}")
+            else:
+                push(numpy.float64(item))
+    return numpy.broadcast_to(stack[0], (size,))
+
+
+def _evaluate_rows(program, backend, columns, size, first_row):
+    names = list(columns)
+    results = []
+    for i in range(size):
+        variables = {name: columns[name][i] for name in names}
+        try:
+            results.append(evaluate(program, backend, variables))
+        except (ArithmeticError, ValueError) as error:
+            raise _row_error(error, first_row + i) from error
+    return results
+
+
+def _use_numpy(backend, vectorize):
+    if vectorize is None:
+        return numpy is not None and backend is FLOAT
+    if vectorize and numpy is None:
+        raise ValueError("NumPy is not installed")
+    if vectorize and backend is not FLOAT:
+        raise ValueError("Only the float mode can be vectorized")
+    return vectorize
+
+
+# Evaluate text for every row of arrays (name -> list or NumPy array, all the
+# same length). Returns a NumPy array when vectorized, a list otherwise.
+def evaluate_arrays(text, arrays, backend=FLOAT, vectorize=None):
+    program = compile_expression(text, backend)
+    names = variable_names(program)
+    for name in names:
+        if name not in arrays:
+            raise ExpressionError(f"Unknown variable {name!r}")
+    sizes = {len(arrays[name]) for name in names}
+    if len(sizes) > 1:
+        raise ValueError("All the columns must have the same length")
+    size = sizes.pop() if sizes else 1
+
+    if _use_numpy(backend, vectorize):
+        columns = {name: numpy.asarray(arrays[name], dtype=numpy.float64) for name in names}
+        return _evaluate_vectorized(program, columns, size, 1)
+    columns = {name: arrays[name] for name in names}
+    return _evaluate_rows(program, backend, columns, size, 1)
+
+
+# ---------- CSV ----------
+
+def _chunk_results(program, indexes, rows, backend, first_row, vectorized):
+    if vectorized:
+        columns = {name: _read_array(rows, i, name, first_row) for name, i in indexes.items()}
+        return _evaluate_vectorized(program, columns, len(rows), first_row).tolist()
+    columns = {name: _read_column(rows, i, name, backend, first_row) for name, i in indexes.items()}
+    return _evaluate_rows(program, backend, columns, len(rows), first_row)
+
+
+# The rows of a failed chunk before its first bad row, their results and the
+# error for that row. Columns are checked one operation at a time, so the row
+# reported first isn't always the earliest bad one: the rows before it are
+# worked out again until they all succeed.
+def _good_part(program, indexes, rows, backend, first_row, vectorized, error):
+    while getattr(error, "row", first_row) > first_row:
+        part = rows[:error.row - first_row]
+        try:
+            return part, _chunk_results(program, indexes, part, backend, first_row, vectorized), error
+        except (ArithmeticError, ValueError) as earlier:
+            error = earlier
+    return [], [], error
+
+
+# (rows, results) for every chunk of a CSV reader positioned after the header
+def _csv_chunks(program, header, reader, backend, chunk_rows, vectorized):
+    indexes = _column_indexes(program, header)
+    first_row = 1
+    while True:
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            return
+        try:
+            results = _chunk_results(program, indexes, rows, backend, first_row, vectorized)
+        except (ArithmeticError, ValueError) as error:
+            rows, results, error = _good_part(program, indexes, rows, backend, first_row, vectorized, error)
+            if rows:
+                yield rows, results
+            raise error
+        yield rows, results
+        first_row += len(rows)
+
+
+def _read_header(reader):
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("The CSV file is empty")
+    return [name.strip() for name in header]
+
+
+# Evaluate text over the CSV file fp, yielding the results a chunk at a time
+def evaluate_csv(text, fp, backend=FLOAT, chunk_rows=CHUNK_ROWS, vectorize=None):
+    program = compile_expression(text, backend)
+    reader = csv.reader(fp)
+    header = _read_header(reader)
+    for _, results in _csv_chunks(program, header, reader, backend, chunk_rows, _use_numpy(backend, vectorize)):
+        yield results
+
+
+# Copy the CSV file in_fp to out_fp with the result added as a new column.
+# Returns the number of rows written.
+def run_batch(text, in_fp, out_fp, backend=FLOAT, column="result", chunk_rows=CHUNK_ROWS, vectorize=None):
+    program = compile_expression(text, backend)
+    reader = csv.reader(in_fp)
+    writer = csv.writer(out_fp, lineterminator="\n")
+    header = _read_header(reader)
+    writer.writerow(header + [column])
+    count = 0
+    chunks = _csv_chunks(program, header, reader, backend, chunk_rows, _use_numpy(backend, vectorize))
+    for rows, results in chunks:
+        for i, (row, value) in enumerate(zip(rows, results)):
+            try:
+                writer.writerow(row + [format_number(value)])
+            except OverflowError as error:
+                raise _row_error(error, count + i + 1) from error
+        count += len(rows)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a calculator expression over every row of a CSV file")
+    parser.add_argument("expression", help='e.g. "price*qty", using the CSV column names')
+    parser.add_argument("input", help="CSV file with a header row, or - for stdin")
+    parser.add_argument("-o", "--output", help="where to write the CSV (default: stdout)")
+    parser.add_argument("--column", default="result", help="name of the new column (default: result)")
+    parser.add_argument("--mode", choices=["float", "decimal", "fraction"], default="float")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help="significant digits in decimal mode")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read at a time")
+    parser.add_argument("--no-numpy", action="store_true", help="use the pure-Python path even if NumPy is installed")
+    args = parser.parse_args()
+
+    backend = get_backend(args.mode, args.precision)
+    in_fp = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    out_fp = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        run_batch(args.expression, in_fp, out_fp, backend, args.column, max(args.chunk_rows, 1),
+                  False if args.no_numpy else None)
+    except (ArithmeticError, ValueError) as error:
+        sys.exit(f"Error: {error}")
+    finally:
+        if in_fp is not sys.stdin:
+            in_fp.close()
+        if out_fp is not sys.stdout:
+            out_fp.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import timeit
+from collections import ChainMap
+
+from expression import compile_expression, evaluate, parse
+from functions import FunctionTable
+from number_backends import DEFAULT_PRECISION, FLOAT, FRACTION, decimal_backend
+
+# Per-operation cost of the calculator's number backends.
+#
+#   python benchmark.py
+#   python benchmark.py --precision 50
+#   python benchmark.py --startup
+#   python benchmark.py --functions
+#
+# Every case is compiled once per backend and then only evaluated, so the
+# numbers are the arithmetic plus the stack machine, not the parsing. The
+# "int" cases show the int fast path, which all backends share.
+#
+# --startup times fresh Python processes instead: the calculator core on
+# its own (what calculator_cli.py loads) against the core plus tkinter (what
+# every start used to load, before the window was even built).
+#
+# --functions compares calling a user-defined function (functions.py) three
+# ways: "interpreted" runs the body's postfix program through evaluate()
+# with the arguments as variables, "closures" calls the compiled function
+# with memoization off, and "memoized" calls it with the same arguments
+# again, so every call is a cache hit.
+
+CASES = [
+    ("int +", "123456+654321"),
+    ("int *", "123456*654321"),
+    ("int /", "123456/654321"),
+    ("int ^", "12^34"),
+    ("big int *", "123456789012345678901234567890*987654321098765432109876543210"),
+    ("decimal +", "1234.5678+8765.4321"),
+    ("decimal *", "1234.5678*8765.4321"),
+    ("decimal /", "1234.5678/8765.4321"),
+    ("decimal %", "1234.5678%87.654321"),
+    ("decimal ^", "1.0001^12"),
+    ("mixed", "(1.5+2.25)*3-4/7+0.1*(8-2.5)^2"),
+]
+
+
+def time_case(text, backend):
+    program = compile_expression(text, backend)
+    timer = timeit.Timer(lambda: evaluate(program, backend))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=3, number=number))
+    return best / number * 1e9  # ns per evaluation
+
+
+STARTUP_CASES = [
+    ("python only", "pass"),
+    ("core", "import calculator_core"),
+    ("core + tkinter", "import tkinter, tkinter.messagebox, calculator_core"),
+]
+
+
+# Best wall time of a fresh python -c code, in ms
+def time_startup(code, runs):
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=here, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+FUNCTION_DEFINITIONS = [
+    "tax(x) = x*1.2",
+    "poly(x) = 3*x^2+2*x+1",
+    "rate = 0.2",
+    "net(p, q) = p*q*(1-rate)",
+    "sq(x) = x*x",
+    "hyp(a, b) = (sq(a)+sq(b))^0.5",
+]
+FUNCTION_CASES = [("tax", (123.45,)), ("poly", (7.5,)), ("net", (19.99, 3)), ("hyp", (3.0, 4.0))]
+
+
+# The same definitions, but every call re-runs the body's postfix program
+def interpreted_functions(table, backend):
+    functions = {}
+    constants = table.constants(backend)
+
+    def interpreted(program, params):
+        return lambda *args: evaluate(program, backend, ChainMap(dict(zip(params, args)), constants), functions)
+
+    for name, (params, body) in table.definitions.items():
+        if params is not None:
+            functions[name] = interpreted(parse(body, backend), params)
+    return functions
+
+
+def time_call(function, args):
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e9  # ns per call
+
+
+def print_functions():
+    compiled = FunctionTable(memo_size=0)
+    memoized = FunctionTable()
+    for definition in FUNCTION_DEFINITIONS:
+        compiled.define(definition)
+        memoized.define(definition)
+    interpreted = interpreted_functions(compiled, FLOAT)
+    print(f"{'function':<10}{'interpreted':>14}{'closures':>14}{'memoized':>14}   (ns per call, float)")
+    for name, args in FUNCTION_CASES:
+        row = f"{name:<10}"
+        for functions in (interpreted, compiled.functions(FLOAT), memoized.functions(FLOAT)):
+            row += f"{time_call(functions[name], args):>14,.0f}"
+        print(row)
+
+
+def print_startup(runs):
+    print(f"{'start':<16}{'ms':>10}   (best of {runs} fresh processes)")
+    for name, code in STARTUP_CASES:
+        print(f"{name:<16}{time_startup(code, runs):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the calculator's number backends")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help="significant digits for the Decimal backend")
+    parser.add_argument("--startup", action="store_true", help="time cold starts instead")
+    parser.add_argument("--runs", type=int, default=20, help="processes per --startup case")
+    parser.add_argument("--functions", action="store_true", help="time user-defined function calls instead")
+    args = parser.parse_args()
+
+    if args.functions:
+        print_functions()
+        return
+
+    if args.startup:
+        print_startup(args.runs)
+        return
+
+    backends = [FLOAT, decimal_backend(args.precision), FRACTION]
+    print(f"{'case':<12}" + "".join(f"{b.name:>16}" for b in backends) + "   (ns per evaluation)")
+    for name, text in CASES:
+        row = f"{name:<12}"
+        for backend in backends:
+            try:
+                row += f"{time_case(text, backend):>16,.0f}"
+            except (ArithmeticError, ValueError):
+                row += f"{'n/a':>16}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import sys
+
+from calculator_core import CalculatorCore, error_message
+from history import History
+from number_backends import DEFAULT_PRECISION
+
+# The calculator in a terminal. Never imports tkinter, so it starts fast and
+# works without a display.
+#
+#   python calculator_cli.py "2+3*4"                 # prints 14
+#   python calculator_cli.py --mode fraction "1/3+1/6"
+#   python calculator_cli.py                         # interactive
+#
+# Interactively every line is worked out like pressing "=", and a line
+# starting with an operator carries on from the last result:
+#
+#   > 2+3
+#   5
+#   > *4
+#   20
+#
+# :mode float|decimal|fraction and :digits N change the number mode, :q quits.
+# :history [N] lists the last results (1 = newest), :search TEXT finds past
+# expressions containing TEXT, and :recall N puts result N back as the last
+# result without working it out again, so "+1" next carries on from it.
+# --history FILE (or CALC_HISTORY_PATH) keeps the tape between runs.
+#
+# A line like "tax(x) = x*1.2" or "rate = 0.2" defines a function or
+# constant for the rest of the session; :functions lists them.
+
+PROMPT = "> "
+HISTORY_ROWS = 10
+HELP = ("Commands: :mode float|decimal|fraction, :digits N, :history [N], :search TEXT, :recall N, "
+        ":functions, :q")
+
+
+def format_entries(entries):
+    return "\n".join(f"{i:>4}  {entry.expression} = {entry.result}" for i, entry in enumerate(entries, 1))
+
+
+def run_command(core, line):
+    name, _, value = line[1:].partition(" ")
+    value = value.strip()
+    if name == "mode" and value in ("float", "decimal", "fraction"):
+        core.mode = value
+    elif name == "digits" and value.isdigit() and int(value) > 0:
+        core.precision = int(value)
+    elif name == "history" and (value.isdigit() or not value):
+        return format_entries(core.history.last(int(value or HISTORY_ROWS))) or "No history yet"
+    elif name == "functions" and not value:
+        return "\n".join(core.functions.describe(name) for name in core.functions.definitions) or "No functions yet"
+    elif name == "search" and value:
+        return format_entries(core.history.search(value, HISTORY_ROWS)) or "Nothing found"
+    elif name == "recall" and value.isdigit() and int(value) > 0:
+        entries = core.history.last(int(value))
+        if len(entries) < int(value):
+            return "That result is no longer in the history"
+        core.recall(entries[-1].result)
+        return core.text
+    else:
+        return HELP
+    return f"mode {core.mode}, {core.precision} digits" if core.mode == "decimal" else f"mode {core.mode}"
+
+
+def repl(core, lines=sys.stdin, out=sys.stdout):
+    interactive = lines is sys.stdin and sys.stdin.isatty()
+    while True:
+        if interactive:
+            out.write(PROMPT)
+            out.flush()
+        line = lines.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        if line in (":q", ":quit"):
+            break
+        if line.startswith(":"):
+            print(run_command(core, line), file=out)
+            continue
+        try:
+            print(core.enter(line), file=out)
+        except (ArithmeticError, ValueError) as e:
+            print(error_message(e), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculator without a window")
+    parser.add_argument("expression", nargs="*", help="worked out and printed; none to start the interactive mode")
+    parser.add_argument("--mode", choices=["float", "decimal", "fraction"], default="float")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION, help="significant digits in decimal mode")
+    parser.add_argument("--history", default=os.environ.get("CALC_HISTORY_PATH"),
+                        help="file to keep the history tape in (default: $CALC_HISTORY_PATH, or none)")
+    args = parser.parse_args()
+
+    core = CalculatorCore(args.mode, max(1, args.precision), History(args.history))
+    try:
+        if not args.expression:
+            repl(core)
+            return
+        print(core.enter(" ".join(args.expression)))
+    except (ArithmeticError, ValueError) as e:
+        sys.exit(error_message(e))
+    finally:
+        core.history.close()
+
+
+if __name__ == "__main__":
+    main()
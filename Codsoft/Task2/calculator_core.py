@@ -0,0 +1,144 @@
+import re
+
+from expression import ExpressionError, compile_expression, evaluate
+from functions import FunctionTable, is_definition
+from history import make_entry
+from number_backends import DEFAULT_PRECISION, format_number, get_backend
+
+# The calculator without a window: what the display shows and what each
+# button does to it. Calculator.py (Tk) and calculator_cli.py (terminal) are
+# both just views over a CalculatorCore, so this module must never import
+# tkinter.
+#
+# text is the whole expression on the display (e.g. "2+3*4"), worked out by
+# the expression engine when "=" is pressed. With a history.History every
+# result is recorded on its tape. A display like "tax(x) = x*1.2" defines a
+# function (or constant) instead, for later expressions to use.
+
+# A typed line starting with one of these carries on from the last result.
+# Not "-": "-5" on its own reads as a new negative number.
+CONTINUE_OPERATORS = "+*/%^×÷"
+
+
+class CalculatorCore:
+    def __init__(self, mode="float", precision=DEFAULT_PRECISION, history=None, functions=None):
+        self.text = "0"
+        self.history = history
+        self.functions = FunctionTable() if functions is None else functions
+        self.clear_on_next = False  # True right after a result is shown
+        self.mode = mode  # "float", "decimal" or "fraction"
+        self.precision = precision  # significant digits in decimal mode
+
+    def backend(self):
+        return get_backend(self.mode, self.precision)
+
+    # A digit button
+    def press_digit(self, digit):
+        # If we just calculated something, start a new number
+        if self.clear_on_next:
+            self.text = ""
+            self.clear_on_next = False
+        # If the display shows "0", replace it. Otherwise, append
+        if self.text == "0":
+            self.text = str(digit)
+        else:
+            self.text += str(digit)
+
+    # Decimal point, only one per number
+    def add_decimal(self):
+        current_number = re.split(r"[-+*/%^(),]", self.text)[-1]
+        if "." not in current_number:
+            self.text += "."
+
+    # An operator or bracket button
+    def set_operation(self, op):
+        # After a result, an operator carries on from it ("=" then "+ 2")
+        # but an opening bracket starts a new expression
+        if self.text == "0" and op in "(-" or self.clear_on_next and op == "(":
+            self.text = ""
+        self.text += op
+        self.clear_on_next = False
+
+    def backspace(self):
+        self.text = self.text[:-1] or "0"
+        self.clear_on_next = False
+
+    def clear(self):
+        self.text = "0"
+        self.clear_on_next = False
+
+    # Work out the display and show the result, which is also returned.
+    # Errors are raised for the view to report (see error_message); division
+    # by zero clears the display first, the others leave it to be fixed.
+    # A definition is stored, the display goes back to 0 and the definition
+    # is returned as text.
+    def calculate(self):
+        if is_definition(self.text):
+            name = self.functions.define(self.text)
+            self.clear()
+            return self.functions.describe(name)
+        try:
+            backend = self.backend()
+            # Compiled expressions are cached, so repeating one skips the parsing
+            program = compile_expression(self.text, backend)
+            result = evaluate(program, backend, self.functions.constants(backend),
+                              self.functions.functions(backend))
+            # Whole numbers without .0, fractions as a/b
+            text = format_number(result)
+        except ZeroDivisionError:
+            self.clear()
+            raise
+        if self.history is not None:
+            self.history.record(make_entry(self.text, program, text))
+        self.text = text
+        self.clear_on_next = True
+        return text
+
+    # Put a past result (display text, e.g. from the history) back on the
+    # display as it is, without working anything out again. After an
+    # operator or "(" it is added to the expression, in brackets unless it
+    # is a plain number (2^ then 1/3 gives 2^(1/3)); otherwise it replaces
+    # the display like a fresh result.
+    def recall(self, result):
+        if self.text and self.text[-1] in "+-*/%^(,×÷−" and not self.clear_on_next:
+            plain = result.replace(".", "", 1).isdigit()
+            self.text += result if plain else f"({result})"
+        else:
+            self.text = result
+            self.clear_on_next = True
+
+    # A typed line (CLI): an expression, or an operator carrying on from the
+    # last result ("+2"). Returns the result like calculate().
+    def enter(self, line):
+        line = line.strip()
+        if self.clear_on_next and line[:1] and line[0] in CONTINUE_OPERATORS:
+            self.text += line
+        else:
+            self.text = line
+        return self.calculate()
+
+    # One button by its label, e.g. "7", ".", "+", "=", "C" or "⌫"
+    def press(self, key):
+        if key.isdigit():
+            self.press_digit(int(key))
+        elif key == ".":
+            self.add_decimal()
+        elif key == "=":
+            self.calculate()
+        elif key == "C":
+            self.clear()
+        elif key == "⌫":
+            self.backspace()
+        else:
+            self.set_operation(key)
+        return self.text
+
+
+# The text to show for an error raised by CalculatorCore.calculate()
+def error_message(error):
+    if isinstance(error, ZeroDivisionError):
+        # Watch out for division by zero!
+        return "Cannot divide by zero!"
+    if isinstance(error, ExpressionError):
+        return f"Invalid expression: {error}"
+    return f"Cannot calculate that: {error}"
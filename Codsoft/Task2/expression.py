@@ -0,0 +1,235 @@
+import re
+from functools import lru_cache
+
+from number_backends import FLOAT
+
+# Expression engine for the calculator.
+#
+#   text --tokenize--> tokens --parse (Pratt)--> postfix program --evaluate--> number
+#
+# A compiled program is a flat tuple in postfix order: numbers are pushed on a
+# stack and operator names pop their operands, so "2+3*4" becomes
+# (2, 3, 4, '*', '+'). Literals are turned into numbers of the chosen backend
+# (float, Decimal or Fraction, see number_backends.py) when compiling.
+# Programs are kept in an LRU cache keyed by the expression text and backend,
+# so evaluating the same expression again skips tokenizing and parsing.
+# Nothing here ever calls eval().
+#
+# Names (e.g. "price*qty") are variables, looked up when evaluating; see
+# batch.py for running one expression over whole columns of data. A name
+# followed by brackets is a function call, e.g. tax(100) or max2(a, b); the
+# functions themselves are user-defined, see functions.py.
+#
+# Precedence, lowest first: + -, then * / %, then unary - +, then ^ (right
+# associative), so -2^2 is -4 and 2^3^2 is 2^9.
+
+CACHE_SIZE = 256
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|(\*\*|[-+*/%^(),×÷−])|([A-Za-z_]\w*))")
+# The display buttons use the typographic signs
+OPERATOR_ALIASES = {'×': '*', '÷': '/', '−': '-', '**': '^'}
+
+BINARY_PRECEDENCE = {'+': 10, '-': 10, '*': 20, '/': 20, '%': 20, '^': 40}
+RIGHT_ASSOCIATIVE = {'^'}
+UNARY_PRECEDENCE = 30
+
+
+# A syntax error; position is the index in the text where it was found
+class ExpressionError(ValueError):
+    def __init__(self, message, position=None):
+        super().__init__(message)
+        self.position = position
+
+
+# A variable in a compiled program
+class Variable:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Variable({self.name!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Variable) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+# A function call in a compiled program: pops argc values, pushes the result
+class Call:
+    __slots__ = ('name', 'argc')
+
+    def __init__(self, name, argc):
+        self.name = name
+        self.argc = argc
+
+    def __repr__(self):
+        return f"Call({self.name!r}, {self.argc})"
+
+    def __eq__(self, other):
+        return isinstance(other, Call) and (other.name, other.argc) == (self.name, self.argc)
+
+    def __hash__(self):
+        return hash((self.name, self.argc))
+
+
+# Split text into (kind, value, position) tokens, kind being "num" (value is
+# the literal text), "op" or "name".
+# A final ("end", None, len(text)) token marks the end.
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_PATTERN.match(text, pos)
+        if match is None:
+            bad = len(text) - len(text[pos:].lstrip())
+            raise ExpressionError(f"Unexpected character {text[bad]!r}", bad)
+        number, op, name = match.groups()
+        if number is not None:
+            tokens.append(("num", number, match.start(1)))
+        elif op is not None:
+            tokens.append(("op", OPERATOR_ALIASES.get(op, op), match.start(2)))
+        else:
+            tokens.append(("name", name, match.start(3)))
+        pos = match.end()
+    tokens.append(("end", None, len(text)))
+    return tokens
+
+
+# Pratt parser that writes the postfix program as it goes
+class _Parser:
+    def __init__(self, tokens, backend):
+        self.tokens = tokens
+        self.backend = backend
+        self.index = 0
+        self.program = []
+
+    def next(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def parse(self):
+        self.expression(0)
+        kind, value, position = self.peek()
+        if kind != "end":
+            raise ExpressionError("Unexpected " + ("number" if kind == "num" else repr(value)), position)
+        return tuple(self.program)
+
+    def expression(self, min_precedence):
+        self.operand()
+        while True:
+            kind, value, position = self.peek()
+            if kind != "op" or value not in BINARY_PRECEDENCE:
+                return
+            precedence = BINARY_PRECEDENCE[value]
+            if precedence < min_precedence:
+                return
+            self.next()
+            self.expression(precedence if value in RIGHT_ASSOCIATIVE else precedence + 1)
+            self.program.append(value)
+
+    def operand(self):
+        kind, value, position = self.next()
+        if kind == "num":
+            self.program.append(self.backend.literal(value))
+        elif kind == "name":
+            if self.peek()[1] == "(":
+                self.next()
+                self.program.append(Call(value, self.arguments()))
+            else:
+                self.program.append(Variable(value))
+        elif value == "(":
+            self.expression(0)
+            kind, value, position = self.next()
+            if value != ")":
+                raise ExpressionError("Missing closing bracket", position)
+        elif value == "-":
+            self.expression(UNARY_PRECEDENCE)
+            self.program.append("neg")
+        elif value == "+":
+            self.expression(UNARY_PRECEDENCE)
+        elif kind == "end":
+            raise ExpressionError("Expression is incomplete", position)
+        else:
+            raise ExpressionError(f"Expected a number before {value!r}", position)
+
+    # The arguments of a call, after its "(": returns how many there were
+    def arguments(self):
+        if self.peek()[1] == ")":
+            self.next()
+            return 0
+        count = 0
+        while True:
+            self.expression(0)
+            count += 1
+            kind, value, position = self.next()
+            if value == ")":
+                return count
+            if value != ",":
+                raise ExpressionError("Missing closing bracket", position)
+
+
+def parse(text, backend=FLOAT):
+    try:
+        return _Parser(tokenize(text), backend).parse()
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply")
+
+
+# Compile text to a postfix program, reusing the cached one when the same
+# text was compiled before. compile_expression.cache_info() shows hits/misses.
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text, backend=FLOAT):
+    return parse(text, backend)
+
+
+# Run a compiled program with the backend it was compiled for, taking
+# variable values from variables (name -> number) and functions from
+# functions (name -> callable). Division by zero raises ZeroDivisionError;
+# results too big or not real raise another ArithmeticError or ValueError.
+def evaluate(program, backend=FLOAT, variables=None, functions=None):
+    operations = backend.operations
+    negate = backend.negate
+    stack = []
+    push = stack.append
+    for item in program:
+        if item.__class__ is str:
+            if item == "neg":
+                stack[-1] = negate(stack[-1])
+            else:
+                right = stack.pop()
+                stack[-1] = operations[item](stack[-1], right)
+        elif item.__class__ is Variable:
+            try:
+                push(variables[item.name])
+            except (KeyError, TypeError):
+                raise ExpressionError(f"Unknown variable {item.name!r}")
+        elif item.__class__ is Call:
+            try:
+                function = functions[item.name]
+            except (KeyError, TypeError):
+                raise ExpressionError(f"Unknown function {item.name!r}")
+            start = len(stack) - item.argc
+            args = stack[start:]
+            del stack[start:]
+            push(function(*args))
+        else:
+            push(item)
+    return stack[0]
+
+
+# Names of the variables a program uses, in order of first use
+def variable_names(program):
+    return list(dict.fromkeys(item.name for item in program if item.__class__ is Variable))
+
+
+def calculate(text, backend=FLOAT, variables=None, functions=None):
+    return evaluate(compile_expression(text, backend), backend, variables, functions)
@@ -0,0 +1,254 @@
+import re
+from functools import lru_cache
+from operator import itemgetter
+
+from expression import Call, ExpressionError, Variable, parse
+
+# User-defined functions and constants for the calculator:
+#
+#   tax(x) = x*1.2
+#   rate = 0.2
+#   net(price, qty) = price*qty*(1-rate)
+#
+# A definition is parsed once, into the same postfix program as any other
+# expression, and then turned into a tree of Python closures (one per
+# operation, with literal operands bound into them and literal-only parts
+# worked out in advance). Calling a function runs those closures directly
+# instead of stepping through the program again.
+#
+# Closures are built per number backend the first time a name is used with
+# it. Bodies can use their parameters, constants and any function, including
+# ones defined later or the function itself; names are looked up when the
+# call happens.
+#
+# Functions can only do arithmetic, so with the definitions fixed they are
+# pure: each one keeps an LRU cache of its last MEMO_SIZE results. Defining
+# anything throws away all compiled functions and their caches.
+#
+# Calls nest at most MAX_DEPTH deep, so a function that calls itself stops
+# with an error instead of running out of stack.
+
+MEMO_SIZE = 1024
+MAX_DEPTH = 64
+
+DEFINITION = re.compile(r"\s*([A-Za-z_]\w*)\s*(?:\(([^()]*)\))?\s*=(.*)", re.S)
+NAME = re.compile(r"[A-Za-z_]\w*")
+NOT_LITERAL = object()
+
+
+def is_definition(text):
+    return DEFINITION.match(text) is not None
+
+
+# ---------- Closures ----------
+
+# Every node is a closure node(args) -> number, args being the tuple of the
+# function's arguments. The stack of (node, literal value or NOT_LITERAL)
+# pairs lets operations with literal operands use a cheaper closure.
+
+def _literal(value):
+    return lambda args: value
+
+
+def _negate(negate, node):
+    return lambda args: negate(node(args))
+
+
+def _binary(operation, left, right, left_value, right_value):
+    if right_value is not NOT_LITERAL:
+        return lambda args: operation(left(args), right_value)
+    if left_value is not NOT_LITERAL:
+        return lambda args: operation(left_value, right(args))
+    return lambda args: operation(left(args), right(args))
+
+
+def _constant(constants, name):
+    def node(args):
+        try:
+            return constants[name]
+        except KeyError:
+            raise ExpressionError(f"Unknown variable {name!r}")
+    return node
+
+
+def _call(functions, name, arguments):
+    def node(args):
+        try:
+            function = functions[name]
+        except KeyError:
+            raise ExpressionError(f"Unknown function {name!r}")
+        return function(*[argument(args) for argument in arguments])
+    return node
+
+
+def compile_body(program, params, backend, functions, constants):
+    operations = backend.operations
+    negate = backend.negate
+    stack = []
+    for item in program:
+        if item.__class__ is str:
+            if item == "neg":
+                node, value = stack.pop()
+                if value is not NOT_LITERAL:
+                    value = negate(value)
+                    stack.append((_literal(value), value))
+                else:
+                    stack.append((_negate(negate, node), NOT_LITERAL))
+                continue
+            right, right_value = stack.pop()
+            left, left_value = stack.pop()
+            operation = operations[item]
+            if left_value is not NOT_LITERAL and right_value is not NOT_LITERAL:
+                try:
+                    value = operation(left_value, right_value)
+                    stack.append((_literal(value), value))
+                    continue
+                except (ArithmeticError, ValueError):
+                    pass  # e.g. 1/0: leave it to fail when the function is called
+            stack.append((_binary(operation, left, right, left_value, right_value), NOT_LITERAL))
+        elif item.__class__ is Variable:
+            if item.name in params:
+                stack.append((itemgetter(params.index(item.name)), NOT_LITERAL))
+            else:
+                stack.append((_constant(constants, item.name), NOT_LITERAL))
+        elif item.__class__ is Call:
+            start = len(stack) - item.argc
+            arguments = [node for node, _ in stack[start:]]
+            del stack[start:]
+            stack.append((_call(functions, item.name, arguments), NOT_LITERAL))
+        else:
+            stack.append((_literal(item), item))
+    return stack[0][0]
+
+
+# ---------- Definitions ----------
+
+# name -> compiled function for one backend, compiled on first use
+class _Functions(dict):
+    def __init__(self, table, backend):
+        super().__init__()
+        self.table = table
+        self.backend = backend
+
+    def __missing__(self, name):
+        definition = self.table.definitions.get(name)
+        if definition is None or definition[0] is None:
+            raise KeyError(name)
+        function = self.table.compile_function(name, *definition, self.backend)
+        self[name] = function
+        return function
+
+
+# name -> value of the constants for one backend, worked out on first use
+class _Constants(dict):
+    def __init__(self, table, backend):
+        super().__init__()
+        self.table = table
+        self.backend = backend
+        self.working_out = set()
+
+    def __missing__(self, name):
+        definition = self.table.definitions.get(name)
+        if definition is None or definition[0] is not None:
+            raise KeyError(name)
+        if name in self.working_out:
+            raise ValueError(f"The constant {name} is defined in terms of itself")
+        self.working_out.add(name)
+        try:
+            table = self.table
+            node = compile_body(parse(definition[1], self.backend), (), self.backend,
+                                table.functions(self.backend), self)
+            value = table.guarded(node, ())
+        finally:
+            self.working_out.discard(name)
+        self[name] = value
+        return value
+
+
+class FunctionTable:
+    def __init__(self, memo_size=MEMO_SIZE, max_depth=MAX_DEPTH):
+        self.definitions = {}  # name -> (params tuple, or None for a constant, body text)
+        self.memo_size = memo_size
+        self.max_depth = max_depth
+        self.depth = 0  # calls currently running, nested
+        self.compiled = {}  # backend -> (_Functions, _Constants)
+
+    def __contains__(self, name):
+        return name in self.definitions
+
+    def __len__(self):
+        return len(self.definitions)
+
+    # Add or replace a definition, "f(x) = ..." or "c = ...". Returns its name.
+    def define(self, text):
+        match = DEFINITION.match(text)
+        if match is None:
+            raise ExpressionError("A definition looks like f(x) = x*2 or c = 1.5")
+        name, params_text, body = match.groups()
+        params = None
+        if params_text is not None:
+            params = tuple(p.strip() for p in params_text.split(",")) if params_text.strip() else ()
+            if not all(NAME.fullmatch(p) for p in params):
+                raise ExpressionError("Parameters must be names, like f(x, y)")
+            if len(set(params)) < len(params):
+                raise ExpressionError("A parameter name is used twice")
+        parse(body)  # syntax errors show up now, not at the first call
+        self.definitions[name] = (params, body.strip())
+        self.compiled.clear()
+        return name
+
+    def remove(self, name):
+        del self.definitions[name]
+        self.compiled.clear()
+
+    # The definition as text, e.g. "tax(x) = x*1.2"
+    def describe(self, name):
+        params, body = self.definitions[name]
+        if params is None:
+            return f"{name} = {body}"
+        return f"{name}({', '.join(params)}) = {body}"
+
+    def _tables(self, backend):
+        tables = self.compiled.get(backend)
+        if tables is None:
+            tables = self.compiled[backend] = (_Functions(self, backend), _Constants(self, backend))
+        return tables
+
+    # For evaluate(program, backend, constants, functions)
+    def functions(self, backend):
+        return self._tables(backend)[0]
+
+    def constants(self, backend):
+        return self._tables(backend)[1]
+
+    # Run node(args) one call level deeper
+    def guarded(self, node, args):
+        if self.depth >= self.max_depth:
+            raise ValueError(f"Functions call each other more than {self.max_depth} deep")
+        self.depth += 1
+        try:
+            return node(args)
+        except RecursionError:
+            raise ValueError("Functions call each other too deeply")
+        finally:
+            self.depth -= 1
+
+    def compile_function(self, name, params, body, backend):
+        functions, constants = self._tables(backend)
+        node = compile_body(parse(body, backend), params, backend, functions, constants)
+        arity = len(params)
+        guarded = self.guarded
+
+        def run(*args):
+            return guarded(node, args)
+
+        if self.memo_size:
+            run = lru_cache(maxsize=self.memo_size, typed=True)(run)
+
+        def function(*args):
+            if len(args) != arity:
+                raise ExpressionError(f"{name}() takes {arity} argument{'s' if arity != 1 else ''}, "
+                                      f"not {len(args)}")
+            return run(*args)
+        function.cache = run if self.memo_size else None
+        return function
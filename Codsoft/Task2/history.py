@@ -0,0 +1,184 @@
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+
+from expression import Call, Variable
+from number_backends import format_number
+
+# History tape for the calculator.
+#
+# The newest entries live in a fixed-size ring buffer (a deque with maxlen),
+# so recalling recent calculations never touches the disk. With a path, every
+# entry is also appended to a log file as one JSON line, which is the full
+# history: entries that fall off the ring can still be searched there, and
+# the next session starts with the ring filled from the end of the log.
+# Without a path only the ring is kept. Lines are flushed as they are written; a torn last line (crash mid-write)
+# is cut off when the log is opened again.
+#
+# The log is only ever read backwards from its end, a block at a time, so
+# loading the ring or going n entries back costs the same however long the
+# log has grown. Only len() reads the whole log, the first time it is asked.
+
+CAPACITY = 500
+BLOCK_SIZE = 64 * 1024  # bytes read at a time when reading the log backwards
+
+
+class HistoryEntry:
+    __slots__ = ('expression', 'operands', 'operator', 'result', 'timestamp')
+
+    def __init__(self, expression, operands, operator, result, timestamp):
+        self.expression = expression
+        self.operands = operands  # the numbers, names and functions in the expression, as text
+        self.operator = operator  # the operation done last ("+" for 2+3*4), or None
+        self.result = result  # display text of the result
+        self.timestamp = timestamp  # epoch seconds
+
+    def __repr__(self):
+        return f"HistoryEntry({self.expression!r} = {self.result!r})"
+
+    def to_json(self):
+        return json.dumps([self.expression, list(self.operands), self.operator, self.result, self.timestamp],
+                          ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def from_json(line):
+        expression, operands, operator, result, timestamp = json.loads(line)
+        return HistoryEntry(expression, tuple(operands), operator, result, timestamp)
+
+
+# Build an entry from a compiled program, so nothing is parsed again
+def make_entry(expression, program, result, timestamp=None):
+    operands = tuple(item.name if item.__class__ is Variable or item.__class__ is Call else format_number(item)
+                     for item in program if item.__class__ is not str)
+    last = program[-1] if program else None
+    operator = ("-" if last == "neg" else last) if last.__class__ is str else None
+    return HistoryEntry(expression, operands, operator, result, time.time() if timestamp is None else timestamp)
+
+
+# Offset just past the last "\n" in f before end (0 if there is none): the
+# end of the last complete line
+def _end_of_lines(f, end):
+    position = end
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        i = f.read(size).rfind(b"\n")
+        if i >= 0:
+            return position + i + 1
+    return 0
+
+
+# The lines of f before end (the end of a line), newest first and without
+# their "\n", read a block at a time from end backwards
+def _lines_backwards(f, end):
+    if end <= 0:
+        return
+    position = end - 1  # leave out the last "\n"
+    rest = b""  # the start of a line that began before the block
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + rest).split(b"\n")
+        rest = lines.pop(0)
+        yield from reversed(lines)
+    yield rest
+
+
+# The entries in lines, skipping lines that don't decode
+def _decode(lines):
+    for line in lines:
+        try:
+            yield HistoryEntry.from_json(line)
+        except ValueError:
+            continue
+
+
+class History:
+    def __init__(self, path=None, capacity=CAPACITY):
+        self.path = path
+        self.recent = deque(maxlen=capacity)
+        # Entries in the whole history, on disk or not. With a log this is
+        # counted the first time len() asks (None until then).
+        self.count = None if path else 0
+        self.log = None
+        if path:
+            self._load()
+            self.log = open(path, "a", encoding="utf-8")
+
+    def __len__(self):
+        if self.count is None:
+            self.count = sum(1 for _ in self._log_backwards())
+        return self.count
+
+    # Every entry in the log, newest first
+    def _log_backwards(self):
+        if self.log is not None:
+            self.log.flush()
+        with open(self.path, "rb") as f:
+            end = _end_of_lines(f, f.seek(0, os.SEEK_END))
+            yield from _decode(_lines_backwards(f, end))
+
+    # Fill the ring from the end of the log, and cut off a torn last line so
+    # the next entry doesn't get appended to it. Only the entries the ring
+    # holds are read.
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            good_end = _end_of_lines(f, size)
+            newest = list(islice(_decode(_lines_backwards(f, good_end)), self.recent.maxlen))
+        self.recent.extend(reversed(newest))
+        if good_end < size:
+            os.truncate(self.path, good_end)
+
+    def record(self, entry):
+        self.recent.append(entry)
+        if self.count is not None:
+            self.count += 1
+        if self.log is not None:
+            self.log.write(entry.to_json() + "\n")
+            self.log.flush()
+        return entry
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    # Entries older than the ring, newest first (only kept on disk). The ring
+    # holds the newest entries of the log, so these come after skipping that
+    # many entries back from its end; a ring with room left means there are none.
+    def _older(self):
+        if not self.path or len(self.recent) < self.recent.maxlen:
+            return iter(())
+        return islice(self._log_backwards(), len(self.recent), None)
+
+    # The last n entries, newest first
+    def last(self, n):
+        if n <= len(self.recent):
+            return list(islice(reversed(self.recent), n))
+        result = list(reversed(self.recent))
+        result.extend(islice(self._older(), n - len(result)))
+        return result
+
+    # Entries whose expression contains text (or starts with it, with
+    # prefix=True), newest first. The ring is searched first and the log only
+    # if that doesn't find limit matches.
+    def search(self, text, limit=None, prefix=False):
+        def matches(entry):
+            return entry.expression.startswith(text) if prefix else text in entry.expression
+
+        result = []
+        for entry in reversed(self.recent):
+            if matches(entry):
+                result.append(entry)
+                if limit is not None and len(result) >= limit:
+                    return result
+        older = (entry for entry in self._older() if matches(entry))
+        result.extend(older if limit is None else islice(older, limit - len(result)))
+        return result
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from server import HOST, MAX_PRECISION, PORT
+
+# Load test for server.py.
+#
+#   python loadtest.py --spawn                       # start a server and test it
+#   python loadtest.py --connections 50 --requests 200 --batch 10
+#   python loadtest.py --socket /tmp/calc.sock
+#
+# Every connection sends its requests one after another, each waiting for
+# the answer, and the time from sending a request to reading its response is
+# its latency. --hostile adds a connection per ten that keeps sending
+# expressions as slow as the limits allow until the others are done, to see
+# how much that slows them down; its requests are counted separately.
+
+EXPRESSIONS = ["2+3*4", "(1.5+2.25)*3-4/7", "2^10", "123456789*987654321", "1/3", "7%3",
+               "1/0", "(8-2.5)^2", "-2^2", "0.1+0.2"]
+# About 0.1 s each in decimal mode at the highest precision the server allows
+HOSTILE = "(1.7^1234.5678)^0.5/3.3^777.77"
+
+
+async def open_connection(args):
+    if args.socket:
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def send(reader, writer, request):
+    writer.write(json.dumps(request).encode("utf-8") + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def client(number, args, latencies, counts):
+    reader, writer = await open_connection(args)
+    rng = random.Random(number)
+    try:
+        for i in range(args.requests):
+            request = {'id': i, 'expressions': [rng.choice(EXPRESSIONS) for _ in range(args.batch)],
+                       'mode': args.mode}
+            start = time.perf_counter()
+            response = await send(reader, writer, request)
+            latencies.append(time.perf_counter() - start)
+            if "error" in response:
+                counts['failed'] += 1
+            else:
+                counts['expressions'] += len(response['results'])
+    finally:
+        writer.close()
+
+
+async def hostile_client(args, counts, done):
+    reader, writer = await open_connection(args)
+    request = {'expressions': [HOSTILE] * args.batch, 'mode': "decimal", 'precision': MAX_PRECISION}
+    try:
+        while not done.is_set():
+            response = await send(reader, writer, request)
+            counts['hostile'] += 1
+            # A request that ran out of worker time gets "Timed out" for the rest of its expressions
+            if "error" in response or any("error" in result for result in response.get("results", ())):
+                counts['timed out'] += 1
+    finally:
+        writer.close()
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+async def run(args):
+    latencies = []
+    counts = {'expressions': 0, 'failed': 0, 'hostile': 0, 'timed out': 0}
+    done = asyncio.Event()
+    hostile = [asyncio.create_task(hostile_client(args, counts, done))
+               for _ in range(args.connections // 10 if args.hostile else 0)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n, args, latencies, counts) for n in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*hostile)
+
+    print(f"{args.connections} connections x {args.requests} requests x {args.batch} expressions "
+          f"({args.mode}) in {elapsed:.2f} s")
+    print(f"requests/sec     {len(latencies) / elapsed:>12,.0f}")
+    print(f"expressions/sec  {counts['expressions'] / elapsed:>12,.0f}")
+    print(f"latency p50      {percentile(latencies, 50) * 1000:>12.2f} ms")
+    print(f"latency p99      {percentile(latencies, 99) * 1000:>12.2f} ms")
+    print(f"failed requests  {counts['failed']:>12}")
+    if args.hostile:
+        print(f"hostile requests {counts['hostile']:>12}   ({len(hostile)} connections, "
+              f"{counts['timed out']} timed out, not in the numbers above)")
+
+
+# Start server.py and wait until it accepts connections
+def spawn_server(args):
+    command = [sys.executable, "server.py", "--port", str(args.port)]
+    if args.socket:
+        command += ["--socket", args.socket]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline().strip()
+    if not line:
+        sys.exit("The server did not start")
+    print(line)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the calculator service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100, help="requests per connection")
+    parser.add_argument("--batch", type=int, default=10, help="expressions per request")
+    parser.add_argument("--mode", choices=["float", "decimal", "fraction"], default="float")
+    parser.add_argument("--hostile", action="store_true", help="make every tenth connection send slow expressions")
+    parser.add_argument("--spawn", action="store_true", help="start server.py for the test")
+    parser.add_argument("--workers", type=int, help="worker processes for the spawned server")
+    args = parser.parse_args()
+
+    server = spawn_server(args) if args.spawn else None
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
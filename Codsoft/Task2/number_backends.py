@@ -0,0 +1,183 @@
+import decimal
+import math
+import operator
+from fractions import Fraction
+from functools import lru_cache
+
+# Number types the expression engine can calculate with:
+#   float     fast, but 0.1+0.2 is 0.30000000000000004
+#   decimal   decimal.Decimal with a chosen number of significant digits
+#   fraction  fractions.Fraction, exact rationals (1/3 stays 1/3)
+#
+# Whole-number literals are always parsed as int, and while both operands of
+# an operation are ints it runs on plain ints (exact, and much cheaper than
+# Decimal or Fraction). Only / and non-integer results leave the int path.
+
+DEFAULT_PRECISION = 28
+MAX_INT_BITS = 100_000  # refuse int powers bigger than this instead of hanging
+
+
+def _both_int(a, b):
+    return a.__class__ is int and b.__class__ is int
+
+
+def _int_power(a, b):
+    if abs(a) > 1 and b * a.bit_length() > MAX_INT_BITS:
+        raise OverflowError("Result is too big")
+    return a ** b
+
+
+class NumberBackend:
+    def __init__(self, name, number, divide, power, add=operator.add, subtract=operator.sub,
+                 multiply=operator.mul, remainder=operator.mod, negate=operator.neg):
+        self.name = name
+        self.number = number  # literal text -> number, for non-integer literals
+        self.operations = {
+            '+': self._int_fast_path(operator.add, add),
+            '-': self._int_fast_path(operator.sub, subtract),
+            '*': self._int_fast_path(operator.mul, multiply),
+            '%': self._int_fast_path(operator.mod, remainder),
+            '/': divide,
+            '^': power,
+        }
+        # Unary minus; like the others it has to round in the backend's context
+        self.negate = negate if negate is operator.neg else self._int_negate_fast_path(negate)
+
+    def __repr__(self):
+        return f"NumberBackend({self.name!r})"
+
+    @staticmethod
+    def _int_fast_path(int_operation, operation):
+        if operation is int_operation:
+            # The generic operator already handles int op int natively
+            return operation
+
+        def run(a, b):
+            if _both_int(a, b):
+                return int_operation(a, b)
+            return operation(a, b)
+        return run
+
+    @staticmethod
+    def _int_negate_fast_path(negate):
+        def run(a):
+            if a.__class__ is int:
+                return -a
+            return negate(a)
+        return run
+
+    def literal(self, text):
+        if text.isdigit():
+            return int(text)
+        return self.number(text)
+
+
+# ---------- float ----------
+
+def _float_power(a, b):
+    if _both_int(a, b) and b >= 0:
+        return _int_power(a, b)
+    try:
+        return math.pow(a, b)  # raises instead of returning a complex for (-8)^(1/3)
+    except ValueError:
+        raise ValueError("The result is not a real number")
+
+
+FLOAT = NumberBackend("float", float, operator.truediv, _float_power)
+
+
+# ---------- decimal ----------
+
+def decimal_backend(precision=DEFAULT_PRECISION):
+    return _decimal_backend(int(precision))
+
+
+@lru_cache(maxsize=None)
+def _decimal_backend(precision):
+    context = decimal.Context(prec=precision, traps=[decimal.InvalidOperation, decimal.DivisionByZero,
+                                                     decimal.Overflow])
+
+    def divide(a, b):
+        if _both_int(a, b) and b and a % b == 0:
+            return a // b
+        return context.divide(a, b)
+
+    # context.remainder truncates (its result has the sign of a); give it the
+    # sign of b like int, float and Fraction %, so -7.5 % 2 is 0.5 in every mode
+    def remainder(a, b):
+        if not b:
+            raise ZeroDivisionError("division by zero")
+        result = context.remainder(a, b)
+        if not result:
+            return result.copy_abs()  # 0, never -0
+        if (result < 0) != (b < 0):
+            return context.add(result, b)
+        return result
+
+    def power(a, b):
+        if _both_int(a, b) and b >= 0:
+            return _int_power(a, b)
+        try:
+            return context.power(a, b)
+        except decimal.InvalidOperation:
+            raise ValueError("The result is not a real number")
+
+    return NumberBackend(f"decimal:{precision}", context.create_decimal, divide, power,
+                         context.add, context.subtract, context.multiply, remainder, context.minus)
+
+
+# ---------- fraction ----------
+
+def _fraction_divide(a, b):
+    if not b:
+        raise ZeroDivisionError("division by zero")
+    if _both_int(a, b):
+        return Fraction(a, b) if a % b else a // b
+    return Fraction(a) / b
+
+
+def _fraction_power(a, b):
+    if b.__class__ is int or (b.__class__ is Fraction and b.denominator == 1):
+        b = int(b)
+        if a.__class__ is int and b >= 0:
+            return _int_power(a, b)
+        if abs(b) * max(Fraction(a).numerator.bit_length(), Fraction(a).denominator.bit_length()) > MAX_INT_BITS:
+            raise OverflowError("Result is too big")
+        return Fraction(a) ** b
+    raise ValueError("Fractional powers are not exact, use the Decimal or Float mode")
+
+
+FRACTION = NumberBackend("fraction", Fraction, _fraction_divide, _fraction_power)
+
+
+def get_backend(name, precision=DEFAULT_PRECISION):
+    if name == "decimal":
+        return decimal_backend(precision)
+    return {"float": FLOAT, "fraction": FRACTION}[name]
+
+
+# ---------- Display ----------
+
+# Turn a result into display text that the expression engine can read back,
+# so the next calculation can carry on from it without losing anything
+def format_number(value):
+    try:
+        if value.__class__ is int:
+            return str(value)
+        if isinstance(value, Fraction):
+            if value.denominator == 1:
+                return str(value.numerator)
+            return f"{value.numerator}/{value.denominator}"
+    except ValueError:
+        # Python refuses to turn ints with more than ~4300 digits into text
+        raise OverflowError("The result has too many digits to show")
+    if isinstance(value, decimal.Decimal):
+        if value == value.to_integral_value():
+            return format(value.to_integral_value(), 'f')
+        return format(value, 'f').rstrip('0')
+    # float: drop the .0 of whole numbers and round away float noise
+    if not math.isfinite(value):
+        raise OverflowError("Result is too big")
+    if value == int(value):
+        return str(int(value))
+    return str(round(value, 8))
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import re
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from calculator_core import error_message
+from expression import compile_expression, evaluate
+from number_backends import DEFAULT_PRECISION, format_number, get_backend
+
+# Local calculation service: the calculator's rules (same results, same
+# error texts, whole numbers without .0) for other programs on this machine.
+#
+#   python server.py                         # localhost TCP, port 8765
+#   python server.py --socket /tmp/calc.sock # Unix socket
+#
+# Requests and responses are JSON, one per line:
+#
+#   {"id": 1, "expressions": ["2+3*4", "1/0"], "mode": "float"}
+#   {"id": 1, "results": [{"result": "14"}, {"error": "Cannot divide by zero!"}]}
+#
+# "expression": "..." works for a single one, "mode" is float, decimal or
+# fraction and "precision" the decimal digits. A request that can't be run
+# at all gets {"id": ..., "error": "..."} instead of results.
+#
+# Requests are evaluated in a pool of worker processes, so a slow one only
+# holds up its own worker. Each connection has at most one job in the pool
+# (even after a timeout) and the pool takes at most one job per worker, so a
+# client sending huge or hostile input can't push the others out. On top of that there are limits:
+#   - line length (checked while reading), expressions per request and their
+#     total length
+#   - expression length and digits per number (checked in the worker)
+#   - decimal precision
+#   - a timeout per request, counted from when it arrives, so waiting for a
+#     free worker uses it up too
+#   - worker time per request (max_job_time, well under the timeout, so the
+#     requests queued behind a slow one still have time left). The worker
+#     checks its deadline, the earlier of the two, before every operation:
+#     once it has passed, the expression being worked out and the ones after
+#     it get a timeout error and the worker moves on. A job can't run much
+#     past its deadline however slow its expressions are.
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_LINE_BYTES = 1_000_000
+MAX_BATCH = 1000
+MAX_EXPRESSION_LENGTH = 1000
+MAX_REQUEST_LENGTH = 100_000  # characters in all of a request's expressions together
+MAX_OPERAND_DIGITS = 100
+MAX_PRECISION = 1000
+TIMEOUT = 2.0  # seconds per request, queueing for a worker included
+MAX_JOB_TIME = 0.5  # seconds of worker time per request
+
+DIGIT_RUN = re.compile(r"\d+")
+MODES = ("float", "decimal", "fraction")
+
+
+# The backend's operations, each checking first that deadline (a time.time()
+# value) hasn't passed
+def _with_deadline(backend, deadline):
+    def checked(operation):
+        def run(a, b):
+            if time.time() > deadline:
+                raise TimeoutError
+            return operation(a, b)
+        return run
+
+    timed = copy.copy(backend)
+    timed.operations = {symbol: checked(operation) for symbol, operation in backend.operations.items()}
+    return timed
+
+
+# Runs in a worker process: the results of one request, stopping at deadline
+def evaluate_batch(expressions, mode, precision, max_length, max_digits, deadline=None):
+    backend = get_backend(mode, precision)
+    timed = backend if deadline is None else _with_deadline(backend, deadline)
+    results = []
+    for i, text in enumerate(expressions):
+        if deadline is not None and time.time() > deadline:
+            results.extend({'error': "Timed out"} for _ in expressions[i:])
+            break
+        if not isinstance(text, str):
+            results.append({'error': "Expressions must be strings"})
+            continue
+        if len(text) > max_length:
+            results.append({'error': f"Expression is longer than {max_length} characters"})
+            continue
+        if any(len(digits) > max_digits for digits in DIGIT_RUN.findall(text)):
+            results.append({'error': f"Numbers can have at most {max_digits} digits"})
+            continue
+        try:
+            # compiled with backend so the compile cache is shared between requests
+            results.append({'result': format_number(evaluate(compile_expression(text, backend), timed))})
+        except TimeoutError:
+            results.extend({'error': "Timed out"} for _ in expressions[i:])
+            break
+        except (ArithmeticError, ValueError) as e:
+            results.append({'error': error_message(e)})
+    return results
+
+
+class CalculatorService:
+    def __init__(self, workers=None, timeout=TIMEOUT, max_batch=MAX_BATCH,
+                 max_expression_length=MAX_EXPRESSION_LENGTH, max_operand_digits=MAX_OPERAND_DIGITS,
+                 max_request_length=MAX_REQUEST_LENGTH, max_job_time=MAX_JOB_TIME):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_job_time = max_job_time
+        self.max_batch = max_batch
+        self.max_request_length = max_request_length
+        self.max_expression_length = max_expression_length
+        self.max_operand_digits = max_operand_digits
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.free_workers = None  # asyncio.Semaphore, made on the event loop
+        self.clients = {}  # writer -> handler task, for the open connections
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    # The checks that are cheap enough for the event loop; returns
+    # (expressions, mode, precision) or raises ValueError
+    def parse_request(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        if "expressions" in request:
+            expressions = request["expressions"]
+            if not isinstance(expressions, list):
+                raise ValueError('"expressions" must be a list')
+        elif "expression" in request:
+            expressions = [request["expression"]]
+        else:
+            raise ValueError('A request needs "expression" or "expressions"')
+        if len(expressions) > self.max_batch:
+            raise ValueError(f"At most {self.max_batch} expressions per request")
+        if sum(len(text) for text in expressions if isinstance(text, str)) > self.max_request_length:
+            raise ValueError(f"At most {self.max_request_length} characters of expressions per request")
+        mode = request.get("mode", "float")
+        if mode not in MODES:
+            raise ValueError(f'"mode" must be one of {", ".join(MODES)}')
+        precision = request.get("precision", DEFAULT_PRECISION)
+        if not isinstance(precision, int) or not 1 <= precision <= MAX_PRECISION:
+            raise ValueError(f'"precision" must be a whole number from 1 to {MAX_PRECISION}')
+        return expressions, mode, precision
+
+    # Run a request in the pool, all within the timeout
+    async def run(self, request, connection):
+        expressions, mode, precision = self.parse_request(request)
+        deadline = time.time() + self.timeout
+        try:
+            return await asyncio.wait_for(self._run_job(expressions, mode, precision, connection, deadline),
+                                          self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timed out after {self.timeout:g} s")
+
+    # connection['job'] is the connection's last job, which can still be
+    # running after a timeout: the next request waits for it, so one
+    # connection never holds more than one worker.
+    async def _run_job(self, expressions, mode, precision, connection, deadline):
+        if connection['job'] is not None:
+            await asyncio.wait([connection['job']])
+        await self.free_workers.acquire()
+        deadline = min(deadline, time.time() + self.max_job_time)
+        job = asyncio.get_running_loop().run_in_executor(
+            self.pool, evaluate_batch, expressions, mode, precision,
+            self.max_expression_length, self.max_operand_digits, deadline)
+        # The worker is only free again once the job is really done, even if
+        # the client has stopped waiting for it
+        job.add_done_callback(lambda _: self.free_workers.release())
+        connection['job'] = job
+        return await asyncio.shield(job)
+
+    async def handle(self, request_line, connection):
+        request_id = None
+        try:
+            try:
+                request = json.loads(request_line)
+            except ValueError as e:
+                raise ValueError(f"Not valid JSON: {e}")
+            if isinstance(request, dict):
+                request_id = request.get("id")
+            results = await self.run(request, connection)
+        except (ValueError, TimeoutError) as e:
+            return {'id': request_id, 'error': str(e)}
+        except RecursionError:
+            return {'id': request_id, 'error': "Request is nested too deeply"}
+        return {'id': request_id, 'results': results}
+
+    async def serve_client(self, reader, writer):
+        self.clients[writer] = asyncio.current_task()
+        connection = {'job': None}
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than the stream limit: answer and hang up, the
+                    # rest of the line can't be told apart from a new one
+                    writer.write(b'{"id": null, "error": "Request line is too long"}\n')
+                    await writer.drain()
+                    return
+                if not line:
+                    return
+                if not line.strip():
+                    continue
+                response = await self.handle(line, connection)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            writer.close()
+
+    # Serve until SIGINT/SIGTERM (or until stop is set)
+    async def serve(self, host=HOST, port=PORT, socket_path=None, ready=None, stop=None):
+        loop = asyncio.get_running_loop()
+        self.free_workers = asyncio.Semaphore(self.workers)
+        stop = stop or asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        # Start the workers before listening, so forked ones don't inherit
+        # (and keep open) the listening socket
+        await loop.run_in_executor(self.pool, int)
+        if socket_path:
+            server = await asyncio.start_unix_server(self.serve_client, socket_path, limit=MAX_LINE_BYTES)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port, limit=MAX_LINE_BYTES)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await stop.wait()
+                # Closing the connections ends their readline() with EOF
+                handlers = list(self.clients.values())
+                for writer in list(self.clients):
+                    writer.close()
+                await asyncio.gather(*handlers, return_exceptions=True)
+        finally:
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve calculator evaluations as JSON lines")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per request")
+    parser.add_argument("--max-job-time", type=float, default=MAX_JOB_TIME,
+                        help="seconds of worker time per request")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="expressions per request")
+    parser.add_argument("--max-length", type=int, default=MAX_EXPRESSION_LENGTH, help="characters per expression")
+    parser.add_argument("--max-digits", type=int, default=MAX_OPERAND_DIGITS, help="digits per number")
+    parser.add_argument("--max-request-length", type=int, default=MAX_REQUEST_LENGTH,
+                        help="characters of expressions per request")
+    args = parser.parse_args()
+
+    service = CalculatorService(args.workers, args.timeout, args.max_batch, args.max_length, args.max_digits,
+                                args.max_request_length, args.max_job_time)
+
+    def ready(server):
+        where = args.socket or f"{args.host}:{args.port}"
+        print(f"Calculator service on {where} with {service.workers} workers", flush=True)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import messagebox
-import random
 import string
 
+from password_core import MAX_LENGTH, MIN_LENGTH, build_charset, generate_passwords
+
+# Passwords can be made in bulk: above this many the list window would get
+# too slow to be useful
+MAX_COUNT = 10000
+
 # Create the main window
 window = tk.Tk()
 window.title("Password Generator")
-window.geometry("500x600")
+window.geometry("500x660")
 window.resizable(False, False)
 window.configure(bg="#34495e")
 
@@ -45,6 +50,30 @@ length_entry = tk.Entry(
 length_entry.pack(side=tk.LEFT, padx=10)
 length_entry.insert(0, "12")  # Default length
 
+# Frame for how many passwords to make at once
+count_frame = tk.Frame(window, bg="#34495e")
+count_frame.pack(pady=5)
+
+count_label = tk.Label(
+    count_frame,
+    text="How Many:",
+    font=("Arial", 14),
+    bg="#34495e",
+    fg="#ecf0f1"
+)
+count_label.pack(side=tk.LEFT, padx=10)
+
+count_entry = tk.Entry(
+    count_frame,
+    font=("Arial", 14),
+    width=10,
+    justify="center",
+    borderwidth=3,
+    relief="ridge"
+)
+count_entry.pack(side=tk.LEFT, padx=10)
+count_entry.insert(0, "1")  # One password per click unless asked for more
+
 # Frame for complexity options
 complexity_frame = tk.LabelFrame(
     window,
@@ -115,42 +144,35 @@ tk.Checkbutton(
 # Function to generate the password
 def generate_password():
     try:
-        # Get the desired length
+        # Get the desired length and number of passwords
         length = int(length_entry.get())
+        count = int(count_entry.get())
         
         # Make sure the length is reasonable
-        if length < 4:
-            messagebox.showwarning("Warning", "Password length should be at least 4 characters!")
+        if length < MIN_LENGTH:
+            messagebox.showwarning("Warning", f"Password length should be at least {MIN_LENGTH} characters!")
             return
         
-        if length > 100:
-            messagebox.showwarning("Warning", "Password length should not exceed 100 characters!")
+        if length > MAX_LENGTH:
+            messagebox.showwarning("Warning", f"Password length should not exceed {MAX_LENGTH} characters!")
             return
         
-        # Build the character pool based on selected options
-        characters = ""
-        
-        if include_lowercase.get():
-            characters += string.ascii_lowercase  # a-z
-        
-        if include_uppercase.get():
-            characters += string.ascii_uppercase  # A-Z
-        
-        if include_numbers.get():
-            characters += string.digits  # 0-9
+        if not 1 <= count <= MAX_COUNT:
+            messagebox.showwarning("Warning", f"You can make from 1 to {MAX_COUNT} passwords at once!")
+            return
         
-        if include_symbols.get():
-            characters += string.punctuation  # !@#$%^&*()_+
+        # Build the character pool based on selected options
+        characters = build_charset(include_lowercase.get(), include_uppercase.get(),
+                                   include_numbers.get(), include_symbols.get())
         
         # Make sure at least one option is selected
         if not characters:
             messagebox.showwarning("Warning", "Please select at least one character type!")
             return
         
-        # Generate the password by randomly picking characters
-        password = ""
-        for i in range(length):
-            password += random.choice(characters)
+        # Generate all the passwords in one go from secure random bytes
+        passwords = generate_passwords(count, length, characters)
+        password = passwords[0]
         
         # Display the password
         password_display.config(state="normal")  # Enable editing temporarily
@@ -162,8 +184,44 @@ def generate_password():
         strength = calculate_strength(password)
         strength_label.config(text=f"Password Strength: {strength}")
         
+        # More than one: list them all in their own window
+        if count > 1:
+            show_passwords(passwords)
+        
     except ValueError:
-        messagebox.showerror("Error", "Please enter a valid number for password length!")
+        messagebox.showerror("Error", "Please enter valid numbers for the length and how many!")
+
+# Function to show a batch of passwords, one per line
+def show_passwords(passwords):
+    text = "\n".join(passwords)
+    
+    list_window = tk.Toplevel(window)
+    list_window.title(f"{len(passwords)} Passwords")
+    list_window.configure(bg="#34495e")
+    
+    password_list = tk.Text(list_window, font=("Courier", 12), width=45, height=20)
+    password_list.insert("1.0", text)
+    password_list.config(state="disabled")
+    password_list.pack(padx=10, pady=10, fill="both", expand=True)
+    
+    def copy_all():
+        window.clipboard_clear()
+        window.clipboard_append(text)
+        messagebox.showinfo("Success", f"{len(passwords)} passwords copied to clipboard! ✓")
+    
+    tk.Button(
+        list_window,
+        text="📋 Copy All",
+        font=("Arial", 12),
+        bg="#3498db",
+        fg="white",
+        command=copy_all,
+        padx=15,
+        pady=5,
+        borderwidth=2,
+        relief="raised",
+        cursor="hand2"
+    ).pack(pady=10)
 
 # Function to calculate password strength (simple version)
 def calculate_strength(password):
@@ -0,0 +1,76 @@
+import argparse
+import random
+import secrets
+import time
+
+from password_core import build_charset, generate_passwords
+
+# Passwords per second, old way against the bulk generator.
+#
+#   python benchmark.py
+#   python benchmark.py --count 1000000 --lengths 12 64
+#
+#   random.choice   what the app used to do: random.choice per character and
+#                   password += ..., with the non-cryptographic random module
+#   secrets.choice  the same loop on the secure generator, the naive fix
+#   bulk            password_core.generate_passwords: big os.urandom buffers,
+#                   rejection sampling with bytes.translate, one slice per
+#                   password
+
+
+def random_choice_passwords(count, length, characters):
+    passwords = []
+    for _ in range(count):
+        password = ""
+        for i in range(length):
+            password += random.choice(characters)
+        passwords.append(password)
+    return passwords
+
+
+def secrets_choice_passwords(count, length, characters):
+    passwords = []
+    for _ in range(count):
+        password = ""
+        for i in range(length):
+            password += secrets.choice(characters)
+        passwords.append(password)
+    return passwords
+
+
+METHODS = [
+    ("random.choice", random_choice_passwords),
+    ("secrets.choice", secrets_choice_passwords),
+    ("bulk", generate_passwords),
+]
+
+
+def passwords_per_second(method, count, length, characters):
+    start = time.perf_counter()
+    method(count, length, characters)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark password generation")
+    parser.add_argument("--count", type=int, default=100_000, help="passwords per run")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[12, 32])
+    args = parser.parse_args()
+
+    characters = build_charset()
+    print(f"{'method':<16}" + "".join(f"{f'length {n}':>16}" for n in args.lengths) + "   (passwords/sec)")
+    results = {}
+    for name, method in METHODS:
+        row = f"{name:<16}"
+        for length in args.lengths:
+            rate = passwords_per_second(method, args.count, length, characters)
+            results[name, length] = rate
+            row += f"{rate:>16,.0f}"
+        print(row)
+    for length in args.lengths:
+        speedup = results["bulk", length] / results["random.choice", length]
+        print(f"bulk is {speedup:,.0f}x random.choice at length {length}")
+
+
+if __name__ == "__main__":
+    main()
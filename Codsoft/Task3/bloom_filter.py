@@ -0,0 +1,49 @@
+import hashlib
+import math
+import struct
+
+# Bloom filter: a compact set that can say "definitely not seen" or "maybe
+# seen". Sized for capacity items at false positive rate error_rate, it takes
+# about -ln(error_rate) / ln(2)^2 bits per item (under 20 bits for 1 in
+# 10,000) however long the items are. The k bit positions of an item are k
+# 32-bit numbers cut from one BLAKE2b hash, so k is at most 16 (a 64-byte
+# hash); lower error rates get more bits instead.
+
+MAX_HASHES = 16
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=1e-4):
+        capacity = max(1, capacity)
+        size = -capacity * math.log(error_rate) / math.log(2) ** 2
+        hashes = round(size / capacity * math.log(2))
+        if hashes > MAX_HASHES:
+            hashes = MAX_HASHES
+            size = -hashes * capacity / math.log(1 - error_rate ** (1 / hashes))
+        self.size = min(max(8, int(size)), 2 ** 32)  # bits
+        self.hashes = max(1, hashes)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # items added
+        self._unpack = struct.Struct(f"<{self.hashes}I").unpack
+
+    def _positions(self, item):
+        size = self.size
+        digest = hashlib.blake2b(item, digest_size=4 * self.hashes).digest()
+        return [n % size for n in self._unpack(digest)]
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    # Add item (bytes); returns True if it was maybe there already
+    def add(self, item):
+        bits = self.bits
+        seen = True
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                seen = False
+                bits[p >> 3] |= mask
+        if not seen:
+            self.count += 1
+        return seen
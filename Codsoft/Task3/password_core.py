@@ -0,0 +1,69 @@
+import os
+import string
+from functools import lru_cache
+
+# Password generation without a window, for the Tk app and for scripts.
+#
+# Random bytes come from os.urandom (the same CSPRNG the secrets module
+# uses), a large buffer at a time. Each byte is mapped onto the character set
+# with one bytes.translate() call for the whole buffer: with n characters,
+# bytes below the largest multiple of n that fits in 256 become
+# charset[byte % n] and the rest are deleted (rejection sampling), so every
+# character is equally likely. The accepted bytes are then cut into
+# passwords, one slice per password, so there are no per-character function
+# calls or string concatenation.
+
+MIN_LENGTH = 4
+MAX_LENGTH = 1024
+
+CHARACTER_SETS = [
+    ("lowercase", string.ascii_lowercase),  # a-z
+    ("uppercase", string.ascii_uppercase),  # A-Z
+    ("numbers", string.digits),  # 0-9
+    ("symbols", string.punctuation),  # !@#$%^&*()_+
+]
+
+
+# The characters to pick from, in the same order as the checkboxes
+def build_charset(lowercase=True, uppercase=True, numbers=True, symbols=True):
+    chosen = {'lowercase': lowercase, 'uppercase': uppercase, 'numbers': numbers, 'symbols': symbols}
+    return "".join(characters for name, characters in CHARACTER_SETS if chosen[name])
+
+
+# (translate table, bytes to delete, share of bytes kept) for a charset
+@lru_cache(maxsize=32)
+def _sampling_tables(charset):
+    if not charset:
+        raise ValueError("Please select at least one character type!")
+    if len(set(charset)) != len(charset) or len(charset) > 256 or not charset.isascii():
+        raise ValueError("The character set must be up to 256 different ASCII characters")
+    characters = charset.encode("ascii")
+    n = len(characters)
+    limit = 256 - 256 % n  # bytes from limit up would make some characters likelier
+    table = bytes(characters[b % n] for b in range(256))
+    return table, bytes(range(limit, 256)), limit / 256
+
+
+# count random characters from charset, as one ASCII str
+def random_characters(count, charset):
+    table, rejected, kept = _sampling_tables(charset)
+    chunks = []
+    have = 0
+    while have < count:
+        # Ask for enough bytes that one round nearly always covers it
+        size = int((count - have) / kept * 1.02) + 64
+        chunk = os.urandom(size).translate(table, rejected)
+        chunks.append(chunk)
+        have += len(chunk)
+    return b"".join(chunks)[:count].decode("ascii")
+
+
+def generate_passwords(count, length, charset):
+    if count < 0 or length < 1:
+        raise ValueError("The count can't be negative and the length must be at least 1")
+    characters = random_characters(count * length, charset)
+    return [characters[i:i + length] for i in range(0, count * length, length)]
+
+
+def generate_password(length, charset):
+    return generate_passwords(1, length, charset)[0]
@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bloom_filter import BloomFilter
+from password_core import MAX_LENGTH, MIN_LENGTH, build_charset, generate_passwords
+
+# Write lots of passwords to a file (or stdout), one per line, no window.
+#
+#   python password_export.py 1000000 -o passwords.txt
+#   python password_export.py 5000 --length 20 --no-symbols
+#   python password_export.py 10000000 --unique -o accounts.txt
+#
+# The character options are the app's four checkboxes. Passwords are made
+# CHUNK passwords at a time in a pool of worker processes and written in the
+# order the chunks were started. At most two chunks per worker are in flight,
+# so memory stays the same however many passwords are asked for.
+#
+# Every worker reads its random bytes straight from os.urandom (the kernel's
+# CSPRNG), so the workers' streams are independent with no seeding to get
+# wrong (unlike the random module, whose state is copied into forked workers).
+#
+# --unique runs every password through a Bloom filter and replaces any that
+# may have been written already, so the output has no duplicates. A false
+# positive only costs a replacement. The filter is the only thing that grows
+# with the count: about 20 bits per password at the default --error-rate.
+
+CHUNK = 100_000
+MAX_TRIES = 100  # replacements in a row for one password before giving up
+
+
+# Runs in a worker: count passwords as newline-terminated ASCII lines
+def generate_chunk(count, length, charset):
+    return ("\n".join(generate_passwords(count, length, charset)) + "\n").encode("ascii")
+
+
+# The chunk sizes adding up to total
+def chunk_sizes(total, chunk):
+    full, rest = divmod(total, chunk)
+    return [chunk] * full + ([rest] if rest else [])
+
+
+# Drop the passwords in data that seen may have had already and make new
+# ones in their place. Returns (data, how many were replaced).
+def replace_duplicates(data, seen, length, charset):
+    lines = data.split(b"\n")[:-1]
+    replaced = 0
+    for i, password in enumerate(lines):
+        tries = 0
+        while seen.add(password):
+            tries += 1
+            if tries > MAX_TRIES:
+                # Nearly every possible password is (maybe) used up
+                raise ValueError("Can't find any more new passwords: make them longer or allow more characters")
+            password = generate_passwords(1, length, charset)[0].encode("ascii")
+        replaced += tries
+        lines[i] = password
+    return b"\n".join(lines) + b"\n", replaced
+
+
+# Yield the generated chunks in order, keeping at most in_flight running
+def generate_chunks(total, length, charset, workers, chunk):
+    sizes = chunk_sizes(total, chunk)
+    if workers <= 1:
+        for size in sizes:
+            yield generate_chunk(size, length, charset)
+        return
+    in_flight = 2 * workers
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for size in sizes:
+            pending.append(pool.submit(generate_chunk, size, length, charset))
+            if len(pending) >= in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Write total passwords to out (a binary file). Returns how many were
+# replaced as possible duplicates (0 without unique).
+def export_passwords(out, total, length, charset, workers=None, chunk=CHUNK, unique=False, error_rate=1e-4):
+    generate_passwords(0, length, charset)  # bad options fail here, before any work
+    if unique and len(charset) ** length < total:
+        raise ValueError(f"There are only {len(charset) ** length:,} different passwords with these options")
+    workers = workers if workers is not None else os.cpu_count() or 1
+    seen = BloomFilter(total, error_rate) if unique else None
+    replaced = 0
+    for data in generate_chunks(total, length, charset, workers, chunk):
+        if seen is not None:
+            data, count = replace_duplicates(data, seen, length, charset)
+            replaced += count
+        out.write(data)
+    out.flush()
+    return replaced
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate passwords in bulk, one per line")
+    parser.add_argument("count", type=int, help="how many passwords")
+    parser.add_argument("--length", type=int, default=12, help="characters per password (default: 12)")
+    parser.add_argument("--no-lowercase", action="store_true", help="leave out a-z")
+    parser.add_argument("--no-uppercase", action="store_true", help="leave out A-Z")
+    parser.add_argument("--no-numbers", action="store_true", help="leave out 0-9")
+    parser.add_argument("--no-symbols", action="store_true", help="leave out !@#$%%^&* and the rest")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU, 1 = no pool)")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="passwords per chunk of work")
+    parser.add_argument("--unique", action="store_true", help="make sure no password is written twice")
+    parser.add_argument("--error-rate", type=float, default=1e-4,
+                        help="false positive rate of the --unique filter (default: 0.0001)")
+    args = parser.parse_args()
+
+    if args.count < 0:
+        parser.error("the count can't be negative")
+    if not MIN_LENGTH <= args.length <= MAX_LENGTH:
+        parser.error(f"the length must be from {MIN_LENGTH} to {MAX_LENGTH}")
+    if not 0 < args.error_rate < 1:
+        parser.error("the error rate must be between 0 and 1")
+    charset = build_charset(not args.no_lowercase, not args.no_uppercase, not args.no_numbers, not args.no_symbols)
+    if not charset:
+        parser.error("leave at least one character type in")
+
+    if args.unique and len(charset) ** args.length < args.count:
+        parser.error(f"there are only {len(charset) ** args.length:,} different passwords with these options")
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    start = time.perf_counter()
+    try:
+        replaced = export_passwords(out, args.count, args.length, charset, args.workers, max(1, args.chunk),
+                                    args.unique, args.error_rate)
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
+    except BrokenPipeError:
+        # e.g. piped into head: stop quietly
+        sys.stderr.close()
+        return
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - start
+    message = f"{args.count:,} passwords in {elapsed:.2f} s ({args.count / max(elapsed, 1e-9):,.0f}/s)"
+    if args.unique:
+        message += f", {replaced:,} possible duplicates replaced"
+    print(message, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()